@@ -1,57 +1,170 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
-from pydantic.error_wrappers import ValidationError
 from services.llm_service import llm_service
 from services.retrieval_service import retrieval_service
 from services.database_service import database_service
+from services.embedding_service import embedding_service
+from services.semantic_cache_service import semantic_cache_service
+from services.vector_service import HNSW_EF_BY_ACCURACY
 from models.chat_models import get_db
 from sqlalchemy.orm import Session
-from utils.validation import ChatRequestValidator, validate_api_response, validate_selected_text_response
+from utils.validation import ChatRequestValidator, SearchRequestValidator, validate_api_response, validate_selected_text_response
 from utils.logging_config import logger
 from utils.cache import response_cache, get_cache_key
+from utils.response_formatter import format_sse_event
+import asyncio
 import uuid
 
 router = APIRouter()
 
-# Pydantic models for request/response
-class ChatRequest(BaseModel):
-    message: str
-    session_id: Optional[str] = None
-    selected_text: Optional[str] = None
-    history: Optional[List[Dict[str, str]]] = []
+# Keep references to fire-and-forget tasks so they are not garbage collected mid-flight
+_background_tasks = set()
+
+def _run_in_background(coro):
+    """
+    Run a coroutine without making the request wait for it
+    """
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def _get_or_create_session(db: Session, session_id: Optional[str]):
+    """
+    Return the existing chat session for session_id, or start a new one
+    """
+    if session_id:
+        session = database_service.get_session(db, UUID(session_id))
+        if session:
+            return session
+    # If session doesn't exist, create a new one
+    return database_service.create_session(db)
+
+async def _retrieve_context(db: Session, session, validated_request: ChatRequestValidator, query_embedding: List[float]):
+    """
+    Record the user query and collect the chunks the answer should be grounded in
+    Returns a (user_query, relevant_chunks, context) tuple
+    """
+    # Create user query record; the route commits it with the rest of the request
+    user_query = database_service.create_user_query(
+        db,
+        session.session_id,
+        validated_request.message,
+        validated_request.selected_text
+    )
+
+    # Determine context based on whether selected text is provided
+    if validated_request.selected_text:
+        # Use only the selected text for context - no vector search needed
+        context = f"Selected text: {validated_request.selected_text}"
+        # For selected text mode, we use the selected text directly as context
+        # No need to search in vector DB since we're restricting to selected text
+        relevant_chunks = [{
+            'chunk_id': 'selected_text',
+            'title': 'Selected Text',
+            'source_path': 'selected_text',
+            'chapter': 'Selected',
+            'section': 'Selected',
+            'content': validated_request.selected_text
+        }]
+    else:
+        # Use retrieved content from the book
+        relevant_chunks = await retrieval_service.aretrieve_relevant_chunks(
+            validated_request.message,
+            top_k=5,
+            query_embedding=query_embedding
+        )
+
+        # Build context from retrieved chunks
+        if relevant_chunks:
+            context = retrieval_service.get_context_string(relevant_chunks)
+        else:
+            context = ""
+
+    return user_query, relevant_chunks, context
+
+def _validate_response(validated_request: ChatRequestValidator, response_text: str):
+    """
+    Run the response validations for a chat answer
+    Returns the (possibly replaced) response text and the validation result to store
+    """
+    # Validate the API response
+    validation_result = validate_api_response(response_text)
+    if not validation_result["is_valid"]:
+        logger.warning(f"Response validation failed: {validation_result['errors']}")
+        response_text = "This information is not available in the book."
+
+    # For selected text queries, perform additional validation to ensure response is based only on selected text
+    final_validation_result = validation_result
+    if validated_request.selected_text:
+        selected_text_validation = validate_selected_text_response(
+            response=response_text,
+            selected_text=validated_request.selected_text
+        )
+
+        # Merge validation results
+        final_validation_result = {
+            "api_validation": validation_result,
+            "selected_text_validation": selected_text_validation
+        }
+
+        if not selected_text_validation["is_valid"]:
+            logger.warning(f"Selected text response validation failed: {selected_text_validation['errors']}")
+            # For now, we'll log the issue but still return the response
+            # In a production system, you might want to handle this differently
+        else:
+            logger.info(f"Selected text response validation passed with confidence: {selected_text_validation.get('confidence', 0.0)}")
 
+    return response_text, final_validation_result
+
+# Chunk fields returned to the client as source citations
+_SOURCE_FIELDS = ('chunk_id', 'title', 'source_path', 'chapter', 'section')
+
+def _build_sources(relevant_chunks: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, str]]]:
+    """
+    Collect the chunk ids stored with the response and the source citations returned
+    to the client, in a single pass over the chunks
+    """
+    source_chunk_ids = []
+    sources = []
+    for chunk in relevant_chunks or ():
+        source_chunk_ids.append(chunk['chunk_id'])
+        sources.append({field: chunk[field] for field in _SOURCE_FIELDS})
+    return source_chunk_ids, sources
+
+# Pydantic models for request/response
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     sources: List[Dict[str, str]]
     confidence: Optional[float] = None
 
-class SearchRequest(BaseModel):
-    query: str
-    top_k: Optional[int] = 5
-    selected_text: Optional[str] = None
-
 class SearchResponse(BaseModel):
     results: List[Dict[str, Any]]
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post(
+    "/chat",
+    response_model=ChatResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": ChatRequestValidator.model_json_schema()}}
+        }
+    }
+)
 async def chat_endpoint(
-    request: ChatRequest,
+    raw_request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Process user query and return response based on book content
     """
     try:
-        # Validate request
-        validated_request = ChatRequestValidator(
-            message=request.message,
-            session_id=request.session_id,
-            selected_text=request.selected_text,
-            history=request.history
-        )
+        # Parse and validate the raw body in a single pass
+        validated_request = ChatRequestValidator.model_validate_json(await raw_request.body())
 
         logger.info(f"Processing chat request: {validated_request.message[:50]}...")
 
@@ -65,117 +178,77 @@ async def chat_endpoint(
         cached_response = response_cache.get(cache_key)
         if cached_response:
             logger.info(f"Cache hit for query: {validated_request.message[:30]}...")
-            return ChatResponse(**cached_response)
-
-        # Create or retrieve session
-        if validated_request.session_id:
-            session_uuid = UUID(validated_request.session_id)
-            session = database_service.get_session(db, session_uuid)
-            if not session:
-                # If session doesn't exist, create a new one
-                session = database_service.create_session(db)
-        else:
-            session = database_service.create_session(db)
+            return ChatResponse.model_construct(**cached_response)
 
-        # Create user query record
-        user_query = database_service.create_user_query(
-            db,
-            session.session_id,
-            validated_request.message,
-            validated_request.selected_text
+        # Create or retrieve the session while embedding the query; the embedding
+        # drives both the semantic cache and retrieval
+        session, query_embedding = await asyncio.gather(
+            run_in_threadpool(_get_or_create_session, db, validated_request.session_id),
+            embedding_service.aembed(validated_request.message)
         )
 
-        # Determine context based on whether selected text is provided
-        if validated_request.selected_text:
-            # Use only the selected text for context - no vector search needed
-            context = f"Selected text: {validated_request.selected_text}"
-            # For selected text mode, we use the selected text directly as context
-            # No need to search in vector DB since we're restricting to selected text
-            relevant_chunks = [{
-                'chunk_id': 'selected_text',
-                'title': 'Selected Text',
-                'source_path': 'selected_text',
-                'chapter': 'Selected',
-                'section': 'Selected',
-                'content': validated_request.selected_text
-            }]
-        else:
-            # Use retrieved content from the book
-            relevant_chunks = retrieval_service.retrieve_relevant_chunks(
-                validated_request.message,
-                top_k=5
+        # Try to reuse the answer to a semantically similar question
+        semantic_hit = await semantic_cache_service.alookup(
+            query_embedding,
+            validated_request.selected_text
+        )
+        if semantic_hit:
+            logger.info(f"Semantic cache hit for query: {validated_request.message[:30]}...")
+            # Store a newly created session before its id reaches the client
+            await run_in_threadpool(db.commit)
+            return ChatResponse.model_construct(
+                response=semantic_hit['response'],
+                session_id=str(session.session_id),
+                sources=semantic_hit['sources'],
+                confidence=None
             )
 
-            # Build context from retrieved chunks
-            if relevant_chunks:
-                context = retrieval_service.get_context_string(relevant_chunks)
-            else:
-                context = ""
+        user_query, relevant_chunks, context = await _retrieve_context(
+            db, session, validated_request, query_embedding
+        )
 
         # Generate response using LLM
-        response_text = llm_service.generate_response(
+        response_text = await llm_service.agenerate_response(
             context=context,
             query=validated_request.message,
             selected_text=validated_request.selected_text
         )
 
-        # Validate the API response
-        validation_result = validate_api_response(response_text)
-        if not validation_result["is_valid"]:
-            logger.warning(f"Response validation failed: {validation_result['errors']}")
-            response_text = "This information is not available in the book."
-
-        # For selected text queries, perform additional validation to ensure response is based only on selected text
-        final_validation_result = validation_result
-        if validated_request.selected_text:
-            selected_text_validation = validate_selected_text_response(
-                response=response_text,
-                selected_text=validated_request.selected_text
-            )
-
-            # Merge validation results
-            final_validation_result = {
-                "api_validation": validation_result,
-                "selected_text_validation": selected_text_validation
-            }
+        response_text, final_validation_result = _validate_response(validated_request, response_text)
 
-            if not selected_text_validation["is_valid"]:
-                logger.warning(f"Selected text response validation failed: {selected_text_validation['errors']}")
-                # For now, we'll log the issue but still return the response
-                # In a production system, you might want to handle this differently
-            else:
-                logger.info(f"Selected text response validation passed with confidence: {selected_text_validation.get('confidence', 0.0)}")
+        # Prepare sources for response
+        source_chunk_ids, sources = _build_sources(relevant_chunks)
 
         # Create response record
         response_record = database_service.create_response(
             db,
             user_query.query_id,
             response_text,
-            source_chunks=[chunk['chunk_id'] for chunk in relevant_chunks] if relevant_chunks else [],
+            source_chunks=source_chunk_ids,
             validation_result=final_validation_result
         )
 
-        # Prepare sources for response
-        sources = []
-        if relevant_chunks:
-            for chunk in relevant_chunks:
-                sources.append({
-                    'chunk_id': chunk['chunk_id'],
-                    'title': chunk['title'],
-                    'source_path': chunk['source_path'],
-                    'chapter': chunk['chapter'],
-                    'section': chunk['section']
-                })
-
-        # Create response object
-        response_obj = ChatResponse(
+        # Commit before responding, so the returned session id is stored and a failed
+        # commit is reported to the client
+        await run_in_threadpool(db.commit)
+
+        # Create response object; every field is produced by this service,
+        # so skip field validation and construct the model directly
+        response_obj = ChatResponse.model_construct(
             response=response_text,
             session_id=str(session.session_id),
-            sources=sources
+            sources=sources,
+            confidence=None
         )
 
         # Cache the response
-        response_cache.put(cache_key, response_obj.dict())
+        response_cache.put(cache_key, response_obj.model_dump())
+        _run_in_background(semantic_cache_service.astore(
+            query_embedding,
+            validated_request.message,
+            {'response': response_text, 'sources': sources},
+            selected_text=validated_request.selected_text
+        ))
 
         logger.info(f"Chat request processed successfully: {validated_request.message[:30]}...")
 
@@ -188,54 +261,171 @@ async def chat_endpoint(
         logger.error(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
-@router.post("/search", response_model=SearchResponse)
-async def search_endpoint(request: SearchRequest):
+@router.post(
+    "/chat/stream",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": ChatRequestValidator.model_json_schema()}}
+        }
+    }
+)
+async def chat_stream_endpoint(
+    raw_request: Request,
+    db: Session = Depends(get_db)
+):
     """
-    Search for relevant content based on user query
+    Process user query and stream the response as server-sent events
+    The first event carries the session id and sources, followed by one event per
+    generated text delta and a final done event
     """
     try:
-        # Validate request
-        validated_request = SearchRequest(
-            query=request.query,
-            top_k=request.top_k,
-            selected_text=request.selected_text
-        )
+        # Parse and validate the raw body in a single pass
+        validated_request = ChatRequestValidator.model_validate_json(await raw_request.body())
 
-        from utils.validation import SearchRequestValidator
-        validated_request = SearchRequestValidator(
-            query=validated_request.query,
-            top_k=validated_request.top_k,
+        logger.info(f"Processing streaming chat request: {validated_request.message[:50]}...")
+
+        cache_key = get_cache_key(
+            message=validated_request.message,
             selected_text=validated_request.selected_text
         )
 
-        logger.info(f"Processing search request: {validated_request.query[:50]}...")
+        session, query_embedding = await asyncio.gather(
+            run_in_threadpool(_get_or_create_session, db, validated_request.session_id),
+            embedding_service.aembed(validated_request.message)
+        )
 
-        # Create cache key
-        cache_key = get_cache_key(
-            query=validated_request.query,
-            top_k=validated_request.top_k,
-            selected_text=validated_request.selected_text
+        # Serve exact and semantic cache hits as a single delta
+        cached = response_cache.get(cache_key) or await semantic_cache_service.alookup(
+            query_embedding,
+            validated_request.selected_text
+        )
+        if cached:
+            logger.info(f"Cache hit for streaming query: {validated_request.message[:30]}...")
+            # Store a newly created session before its id reaches the client
+            await run_in_threadpool(db.commit)
+
+            async def cached_stream():
+                yield format_sse_event({'session_id': str(session.session_id), 'sources': cached['sources']})
+                yield format_sse_event({'delta': cached['response']})
+                yield format_sse_event({'done': True})
+
+            return StreamingResponse(cached_stream(), media_type="text/event-stream")
+
+        user_query, relevant_chunks, context = await _retrieve_context(
+            db, session, validated_request, query_embedding
+        )
+        source_chunk_ids, sources = _build_sources(relevant_chunks)
+
+    except ValidationError as ve:
+        logger.error(f"Validation error in chat stream endpoint: {ve}")
+        raise HTTPException(status_code=422, detail=f"Validation error: {str(ve)}")
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
+
+    def store_response(response_text: str) -> str:
+        """
+        Validate the streamed answer, store it and commit the request's transaction
+        Runs in a worker thread; returns the response text as stored
+        """
+        # Tokens are already on the wire, so validation can only be recorded here, not enforced
+        response_text, final_validation_result = _validate_response(validated_request, response_text)
+
+        database_service.create_response(
+            db,
+            user_query.query_id,
+            response_text,
+            source_chunks=source_chunk_ids,
+            validation_result=final_validation_result
         )
+        db.commit()
+        return response_text
+
+    async def event_stream():
+        yield format_sse_event({'session_id': str(session.session_id), 'sources': sources})
+
+        parts = []
+        try:
+            async for delta in llm_service.astream_response(
+                context=context,
+                query=validated_request.message,
+                selected_text=validated_request.selected_text
+            ):
+                parts.append(delta)
+                yield format_sse_event({'delta': delta})
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            # Keep the session and query, but store no response for a failed generation
+            try:
+                await run_in_threadpool(db.commit)
+            except Exception as commit_error:
+                await run_in_threadpool(db.rollback)
+                logger.error(f"Error saving chat query: {str(commit_error)}")
+            yield format_sse_event({'error': 'Error generating response'})
+            return
+
+        # The response status is already sent, so failures are reported as an error event
+        try:
+            response_text = await run_in_threadpool(store_response, "".join(parts))
+        except Exception as e:
+            await run_in_threadpool(db.rollback)
+            logger.error(f"Error saving streamed chat response: {str(e)}")
+            yield format_sse_event({'error': 'Error saving response'})
+            return
+
+        response_cache.put(cache_key, {
+            'response': response_text,
+            'session_id': str(session.session_id),
+            'sources': sources,
+            'confidence': None
+        })
+        _run_in_background(semantic_cache_service.astore(
+            query_embedding,
+            validated_request.message,
+            {'response': response_text, 'sources': sources},
+            selected_text=validated_request.selected_text
+        ))
+
+        logger.info(f"Streaming chat request processed successfully: {validated_request.message[:30]}...")
+
+        yield format_sse_event({'done': True})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.post(
+    "/search",
+    response_model=SearchResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": SearchRequestValidator.model_json_schema()}}
+        }
+    }
+)
+async def search_endpoint(raw_request: Request):
+    """
+    Search for relevant content based on user query
+    """
+    try:
+        # Parse and validate the raw body in a single pass
+        validated_request = SearchRequestValidator.model_validate_json(await raw_request.body())
 
-        # Try to get results from cache
-        cached_results = response_cache.get(f"search_{cache_key}")
-        if cached_results:
-            logger.info(f"Search cache hit for query: {validated_request.query[:30]}...")
-            return SearchResponse(results=cached_results)
+        logger.info(f"Processing search request: {validated_request.query[:50]}...")
 
-        # Perform search in vector database
-        results = retrieval_service.retrieve_relevant_chunks(
+        # Perform search in vector database; results are cached by the vector service
+        results = await retrieval_service.aretrieve_relevant_chunks(
             validated_request.query,
             top_k=validated_request.top_k,
-            selected_text=validated_request.selected_text
+            selected_text=validated_request.selected_text,
+            hnsw_ef=HNSW_EF_BY_ACCURACY.get(validated_request.accuracy),
+            document_id=validated_request.document_id
         )
 
-        # Cache the results
-        response_cache.put(f"search_{cache_key}", results)
-
         logger.info(f"Search request processed successfully: {validated_request.query[:30]}...")
 
-        return SearchResponse(results=results)
+        # Results come straight from the vector store, no need to re-validate
+        return SearchResponse.model_construct(results=results)
 
     except ValidationError as ve:
         logger.error(f"Validation error in search endpoint: {ve}")
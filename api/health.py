@@ -1,59 +1,67 @@
 from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
 from typing import Dict, Any
+import asyncio
 import os
+import time
+from datetime import datetime
 from services.embedding_service import embedding_service
 from services.vector_service import vector_service
 from services.llm_service import llm_service
 
 router = APIRouter()
 
+# Seconds a health result is reused before the services are probed again
+HEALTH_CACHE_TTL = 10
+
+# Last computed health payload, shared by all requests in this worker
+_health_cache = {"ts": 0.0, "payload": None}
+
+async def _check_cohere() -> bool:
+    # Test with a simple embedding to verify API key works
+    test_embedding = await run_in_threadpool(embedding_service.embed_single_text, "health check")
+    return bool(test_embedding)
+
+async def _check_qdrant() -> bool:
+    # Try to get collection info to verify connection
+    collection_info = await vector_service.aclient.get_collection(vector_service.collection_name)
+    return bool(collection_info)
+
+async def _check_openrouter() -> bool:
+    # A lightweight request is enough to verify the API is reachable; never spend tokens here
+    response = await llm_service.async_client.head(llm_service.base_url, timeout=1.0)
+    return response.status_code < 500
+
 @router.get("/health")
 async def health_check() -> Dict[str, Any]:
     """
     Health check endpoint to verify all services are available
     """
+    if _health_cache["payload"] is not None and time.monotonic() - _health_cache["ts"] < HEALTH_CACHE_TTL:
+        return _health_cache["payload"]
+
+    # Run all probes concurrently; a failing probe only marks its own service as disconnected
+    results = await asyncio.gather(
+        _check_cohere(),
+        _check_qdrant(),
+        _check_openrouter(),
+        return_exceptions=True
+    )
     services_status = {
-        "cohere": "disconnected",
-        "qdrant": "disconnected",
-        "openrouter": "disconnected"
+        name: "connected" if result is True else "disconnected"
+        for name, result in zip(("cohere", "qdrant", "openrouter"), results)
     }
 
-    # Check Cohere API
-    try:
-        # Test with a simple embedding to verify API key works
-        test_embedding = embedding_service.embed_single_text("health check")
-        if test_embedding and len(test_embedding) > 0:
-            services_status["cohere"] = "connected"
-    except Exception:
-        services_status["cohere"] = "disconnected"
-
-    # Check Qdrant connection
-    try:
-        # Try to get collection info to verify connection
-        collection_info = vector_service.client.get_collection(vector_service.collection_name)
-        if collection_info:
-            services_status["qdrant"] = "connected"
-    except Exception:
-        services_status["qdrant"] = "disconnected"
-
-    # Check OpenRouter API
-    try:
-        # Test with a simple request to verify API key works
-        test_response = llm_service.generate_response(
-            context="This is a health check.",
-            query="Is the service working?"
-            # Using default model from llm_service
-        )
-        if test_response:
-            services_status["openrouter"] = "connected"
-    except Exception:
-        services_status["openrouter"] = "disconnected"
-
     # Overall status
     overall_status = "healthy" if all(status == "connected" for status in services_status.values()) else "unhealthy"
 
-    return {
+    payload = {
         "status": overall_status,
-        "timestamp": __import__('datetime').datetime.now().isoformat(),
+        "timestamp": datetime.now().isoformat(),
         "services": services_status
-    }
\ No newline at end of file
+    }
+
+    _health_cache["ts"] = time.monotonic()
+    _health_cache["payload"] = payload
+
+    return payload
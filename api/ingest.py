@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Any
 
@@ -20,7 +21,8 @@ async def ingest_documents_endpoint(request: IngestRequest):
     from ingest import scan_docs_directory
 
     try:
-        chunks = scan_docs_directory(request.docs_dir)
+        # Scan serially in a worker thread so the event loop keeps serving requests
+        chunks = await run_in_threadpool(scan_docs_directory, request.docs_dir)
         return IngestResponse(
             message=f"Successfully processed {len(chunks)} document chunks",
             chunks_processed=len(chunks)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Dict, Any, Literal
 from services.retrieval_service import retrieval_service
+from services.vector_service import HNSW_EF_BY_ACCURACY
 
 router = APIRouter()
 
@@ -9,25 +10,45 @@ class SearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = 5
     selected_text: Optional[str] = None
+    document_id: Optional[str] = None  # Document the selected text was taken from, if known
+    accuracy: Optional[Literal["fast", "balanced", "accurate"]] = None
 
 class SearchResponse(BaseModel):
     results: List[Dict[str, Any]]
 
-@router.post("/search", response_model=SearchResponse)
-async def search_endpoint(request: SearchRequest):
+@router.post(
+    "/search",
+    response_model=SearchResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": SearchRequest.model_json_schema()}}
+        }
+    }
+)
+async def search_endpoint(raw_request: Request):
     """
     Search for relevant content based on user query
     """
     try:
+        # Parse and validate the raw body in a single pass
+        request = SearchRequest.model_validate_json(await raw_request.body())
+
         # Perform search in vector database
-        results = retrieval_service.retrieve_relevant_chunks(
+        results = await retrieval_service.aretrieve_relevant_chunks(
             request.query,
             top_k=request.top_k,
-            selected_text=request.selected_text
+            selected_text=request.selected_text,
+            hnsw_ef=HNSW_EF_BY_ACCURACY.get(request.accuracy),
+            document_id=request.document_id
         )
 
-        return SearchResponse(results=results)
+        # Results come straight from the vector store, no need to re-validate
+        return SearchResponse.model_construct(results=results)
 
+    except ValidationError as ve:
+        print(f"Validation error in search endpoint: {ve}")
+        raise HTTPException(status_code=422, detail=f"Validation error: {str(ve)}")
     except Exception as e:
         print(f"Error in search endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing search request: {str(e)}")
\ No newline at end of file
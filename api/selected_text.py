@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
 from typing import List, Dict, Any
 from services.llm_service import llm_service
 from services.retrieval_service import retrieval_service
@@ -10,6 +12,7 @@ from uuid import UUID
 import uuid
 from utils.validation import validate_selected_text_response
 from utils.logging_config import logger
+from utils.response_formatter import format_sse_event
 
 router = APIRouter()
 
@@ -22,22 +25,43 @@ class SelectedTextResponse(BaseModel):
     response: str
     session_id: str
 
-@router.post("/selected-text-question", response_model=SelectedTextResponse)
+def _log_validation(validation_result: Dict[str, Any]):
+    """
+    Log the outcome of validating an answer against the selected text
+    """
+    if not validation_result["is_valid"]:
+        logger.warning(f"Selected text response validation failed: {validation_result['errors']}")
+    else:
+        logger.info(f"Selected text response validation passed with confidence: {validation_result.get('confidence', 0.0)}")
+
+@router.post(
+    "/selected-text-question",
+    response_model=SelectedTextResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": SelectedTextRequest.model_json_schema()}}
+        }
+    }
+)
 async def handle_selected_text_question(
-    request: SelectedTextRequest,
+    raw_request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Handle questions specifically about selected text
     """
     try:
+        # Parse and validate the raw body in a single pass
+        request = SelectedTextRequest.model_validate_json(await raw_request.body())
+
         # Validate session exists
         session_uuid = UUID(request.session_id)
-        session = database_service.get_session(db, session_uuid)
+        session = await run_in_threadpool(database_service.get_session, db, session_uuid)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        # Create user query record with selected text
+        # Create user query record with selected text; it is committed with the rest of the request below
         user_query = database_service.create_user_query(
             db,
             session.session_id,
@@ -46,7 +70,7 @@ async def handle_selected_text_question(
         )
 
         # Generate response restricted to selected text
-        response_text = llm_service.generate_response(
+        response_text = await llm_service.agenerate_response(
             context="",  # We'll rely on the selected_text parameter
             query=request.question,
             selected_text=request.selected_text
@@ -58,12 +82,9 @@ async def handle_selected_text_question(
             selected_text=request.selected_text
         )
 
-        if not validation_result["is_valid"]:
-            logger.warning(f"Selected text response validation failed: {validation_result['errors']}")
-            # For now, we'll still return the response but log the validation failure
-            # In a production system, you might want to handle this differently
-        else:
-            logger.info(f"Selected text response validation passed with confidence: {validation_result.get('confidence', 0.0)}")
+        # For now, we'll still return the response but log the validation failure
+        # In a production system, you might want to handle this differently
+        _log_validation(validation_result)
 
         # Create response record
         response_record = database_service.create_response(
@@ -74,11 +95,120 @@ async def handle_selected_text_question(
             validation_result=validation_result  # Store validation result in database
         )
 
-        return SelectedTextResponse(
+        # Commit before responding, so a failed commit is reported to the client
+        await run_in_threadpool(db.commit)
+
+        # Both fields are produced by this service, so skip field validation
+        return SelectedTextResponse.model_construct(
             response=response_text,
             session_id=str(session.session_id)
         )
 
+    except HTTPException:
+        raise
+    except ValidationError as ve:
+        logger.error(f"Validation error in selected text endpoint: {ve}")
+        raise HTTPException(status_code=422, detail=f"Validation error: {str(ve)}")
     except Exception as e:
         print(f"Error in selected text endpoint: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing selected text question: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing selected text question: {str(e)}")
+
+@router.post(
+    "/selected-text-question/stream",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": SelectedTextRequest.model_json_schema()}}
+        }
+    }
+)
+async def stream_selected_text_question(
+    raw_request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Answer a question about selected text, streaming the answer as server-sent events
+    The first event carries the session id, followed by one event per generated
+    text delta and a final done event
+    """
+    try:
+        # Parse and validate the raw body in a single pass
+        request = SelectedTextRequest.model_validate_json(await raw_request.body())
+
+        # Validate session exists
+        session = await run_in_threadpool(database_service.get_session, db, UUID(request.session_id))
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        # Create user query record with selected text; it is committed with the rest of the request below
+        user_query = database_service.create_user_query(
+            db,
+            session.session_id,
+            request.question,
+            selected_text=request.selected_text
+        )
+
+    except HTTPException:
+        raise
+    except ValidationError as ve:
+        logger.error(f"Validation error in selected text stream endpoint: {ve}")
+        raise HTTPException(status_code=422, detail=f"Validation error: {str(ve)}")
+    except Exception as e:
+        logger.error(f"Error in selected text stream endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing selected text question: {str(e)}")
+
+    def store_response(response_text: str):
+        """
+        Validate the streamed answer, store it and commit the request's transaction
+        Runs in a worker thread
+        """
+        validation_result = validate_selected_text_response(
+            response=response_text,
+            selected_text=request.selected_text
+        )
+        _log_validation(validation_result)
+
+        database_service.create_response(
+            db,
+            user_query.query_id,
+            response_text,
+            source_chunks=[],  # No chunks since we're using selected text directly
+            validation_result=validation_result
+        )
+        db.commit()
+
+    async def event_stream():
+        yield format_sse_event({'session_id': str(session.session_id)})
+
+        parts = []
+        try:
+            async for delta in llm_service.astream_response(
+                context="",  # We'll rely on the selected_text parameter
+                query=request.question,
+                selected_text=request.selected_text
+            ):
+                parts.append(delta)
+                yield format_sse_event({'delta': delta})
+        except Exception as e:
+            logger.error(f"Error streaming selected text response: {str(e)}")
+            # Keep the query, but store no response for a failed generation
+            try:
+                await run_in_threadpool(db.commit)
+            except Exception as commit_error:
+                await run_in_threadpool(db.rollback)
+                logger.error(f"Error saving selected text query: {str(commit_error)}")
+            yield format_sse_event({'error': 'Error generating response'})
+            return
+
+        # The response status is already sent, so failures are reported as an error event
+        try:
+            await run_in_threadpool(store_response, "".join(parts))
+        except Exception as e:
+            await run_in_threadpool(db.rollback)
+            logger.error(f"Error saving streamed selected text response: {str(e)}")
+            yield format_sse_event({'error': 'Error saving response'})
+            return
+
+        yield format_sse_event({'done': True})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
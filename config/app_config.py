@@ -18,6 +18,16 @@ class AppConfig(BaseSettings):
 
     # Qdrant settings
     qdrant_collection_name: str = os.getenv("QDRANT_COLLECTION_NAME", "book_chunks")
+    qdrant_ef_search: int = int(os.getenv("QDRANT_EF_SEARCH", "64"))  # Minimum HNSW candidate list size at query time
+
+    # Database connection pool (per worker process)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+    db_statement_timeout: int = int(os.getenv("DB_STATEMENT_TIMEOUT", "5000"))  # milliseconds
+    # Executions of a statement before psycopg prepares it server-side; unset disables
+    # prepared statements, which PgBouncer's transaction mode (Neon's pooled endpoint) cannot keep
+    db_prepare_threshold: Optional[int] = int(os.environ["DB_PREPARE_THRESHOLD"]) if os.getenv("DB_PREPARE_THRESHOLD") else None
 
     # Service availability
     cohere_enabled: bool = bool(os.getenv("COHERE_API_KEY", ""))
@@ -38,6 +48,8 @@ class AppConfig(BaseSettings):
     # Caching
     cache_enabled: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
     cache_ttl: int = int(os.getenv("CACHE_TTL", "3600"))  # seconds
+    semantic_cache_collection: str = os.getenv("SEMANTIC_CACHE_COLLECTION", "llm_response_cache")
+    semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))  # cosine similarity
 
     class Config:
         env_file = ".env"
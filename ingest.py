@@ -1,29 +1,56 @@
 import os
 import re
-from typing import List, Dict, Any
-import uuid
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from bs4 import BeautifulSoup
-import markdown
-from services.embedding_service import embedding_service
-from services.vector_service import vector_service
+from markdown_it import MarkdownIt
 from utils.chunking_utils import chunk_document, clean_text
 
+# First level 1 or 2 markdown heading
+_TITLE_RE = re.compile(r'^#{1,2} (.+)$', re.M)
+
+# Tags inside raw HTML/JSX blocks; their text content is kept
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+_markdown_parser = MarkdownIt("commonmark").enable("table")
+
+# Default docs directory, used when a file is processed outside of a directory scan
+DOCS_ABS_PATH = os.path.abspath('../docs')
+
 def extract_title_from_content(content: str) -> str:
     """
     Extract title from markdown content (first heading)
     """
-    lines = content.split('\n')
-    for line in lines:
-        if line.startswith('# '):
-            return line[2:].strip()  # Remove '# ' prefix
-        elif line.startswith('## '):
-            return line[3:].strip()  # Remove '## ' prefix
-    return "Untitled"
-
-def process_markdown_file(file_path: str) -> List[Dict[str, Any]]:
+    match = _TITLE_RE.search(content)
+    return match.group(1).strip() if match else "Untitled"
+
+def markdown_to_plain_text(content: str) -> str:
+    """
+    Convert markdown to plain text by walking the parsed tokens, without rendering HTML
+    """
+    parts = []
+    for token in _markdown_parser.parse(content):
+        if token.type == "inline":
+            for child in token.children:
+                if child.type in ("text", "code_inline"):
+                    parts.append(child.content)
+                elif child.type in ("softbreak", "hardbreak"):
+                    parts.append("\n")
+        elif token.type in ("fence", "code_block"):
+            parts.append(token.content)
+        elif token.type == "html_block":
+            parts.append(_HTML_TAG_RE.sub("", token.content))
+        elif token.nesting == -1:
+            # Separate the text of consecutive blocks
+            parts.append("\n")
+    return "".join(parts)
+
+def process_markdown_file(file_path: str, relative_path: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Process a markdown file and return chunks with metadata
+    Process a markdown file and return chunks with metadata.
+    relative_path is the path of the file inside the docs directory, as found by the scan
     """
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
@@ -34,19 +61,15 @@ def process_markdown_file(file_path: str) -> List[Dict[str, Any]]:
         title = Path(file_path).stem
 
     # Convert markdown to plain text for chunking
-    html = markdown.markdown(content)
-    soup = BeautifulSoup(html, 'html.parser')
-    plain_text = soup.get_text()
+    plain_text = markdown_to_plain_text(content)
 
-    # Clean the text
+    # Clean the text, so token counts and sentence boundaries are computed on what gets stored
     clean_content = clean_text(plain_text)
 
     # Extract metadata from file path and content
-    # Convert to absolute path and get relative path from docs directory
-    abs_path = os.path.abspath(file_path)
-    docs_abs_path = os.path.abspath('../docs')
-    relative_path = os.path.relpath(abs_path, docs_abs_path)
-    document_id = str(uuid.uuid5(uuid.NAMESPACE_URL, file_path))
+    if relative_path is None:
+        relative_path = os.path.relpath(file_path, DOCS_ABS_PATH)
+    document_id = hashlib.blake2b(file_path.encode(), digest_size=16).hexdigest()
 
     # Try to extract chapter/section from path
     path_parts = relative_path.split('/')
@@ -55,7 +78,7 @@ def process_markdown_file(file_path: str) -> List[Dict[str, Any]]:
 
     # Use the new chunking utilities
     chunks = chunk_document(
-        content=plain_text,
+        content=clean_content,
         source_path=relative_path,
         document_id=document_id,
         title=title,
@@ -68,9 +91,34 @@ def process_markdown_file(file_path: str) -> List[Dict[str, Any]]:
 
     return chunks
 
-def scan_docs_directory(docs_dir: str = "../docs") -> List[Dict[str, Any]]:
+def find_markdown_files(docs_dir: str, relative_dir: str = "") -> Iterator[Tuple[str, str]]:
+    """
+    Recursively yield (path, path relative to docs_dir) for all markdown and mdx files under docs_dir
+    """
+    with os.scandir(docs_dir) as entries:
+        for entry in entries:
+            relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from find_markdown_files(entry.path, relative_path)
+            elif entry.is_file() and entry.name.lower().endswith(('.md', '.mdx')):
+                yield entry.path, relative_path
+
+def process_markdown_file_safe(file_path: str, relative_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Process a markdown file, logging and skipping it if it cannot be processed
+    """
+    print(f"Processing file: {file_path}")
+    try:
+        return process_markdown_file(file_path, relative_path)
+    except Exception as e:
+        print(f"Error processing file {file_path}: {str(e)}")
+        return []
+
+def scan_docs_directory(docs_dir: str = "../docs", use_processes: bool = False) -> List[Dict[str, Any]]:
     """
     Scan the docs directory for markdown files and process them
+    use_processes spreads the files over worker processes; only the CLI sets it,
+    since forking a server worker would copy its event loop and open connections
     """
     all_chunks = []
 
@@ -80,17 +128,19 @@ def scan_docs_directory(docs_dir: str = "../docs") -> List[Dict[str, Any]]:
         return []
 
     # Find all markdown and mdx files
-    for root, dirs, files in os.walk(docs_dir):
-        for file in files:
-            if file.lower().endswith(('.md', '.mdx')):
-                file_path = os.path.join(root, file)
-                print(f"Processing file: {file_path}")
-
-                try:
-                    chunks = process_markdown_file(file_path)
-                    all_chunks.extend(chunks)
-                except Exception as e:
-                    print(f"Error processing file {file_path}: {str(e)}")
+    found = list(find_markdown_files(docs_dir))
+    file_paths = [path for path, _ in found]
+    relative_paths = [relative_path for _, relative_path in found]
+
+    if use_processes:
+        # Parsing and chunking is CPU-bound, so spread the files over worker processes.
+        # Spawn rather than fork: a forked child would inherit open gRPC channels, which are not fork-safe
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+            for chunks in executor.map(process_markdown_file_safe, file_paths, relative_paths, chunksize=8):
+                all_chunks.extend(chunks)
+    else:
+        for file_path, relative_path in zip(file_paths, relative_paths):
+            all_chunks.extend(process_markdown_file_safe(file_path, relative_path))
 
     print(f"Total chunks created: {len(all_chunks)}")
     return all_chunks
@@ -99,10 +149,13 @@ def ingest_documents(docs_dir: str = "../docs"):
     """
     Main function to ingest documents from the docs directory
     """
+    # Import here so spawned parsing workers, which re-import this module, do not open service clients
+    from services.vector_service import vector_service
+
     print("Starting document ingestion process...")
 
     # Scan and process all documents
-    chunks = scan_docs_directory(docs_dir)
+    chunks = scan_docs_directory(docs_dir, use_processes=True)
 
     if not chunks:
         print("No documents found to process.")
@@ -110,8 +163,8 @@ def ingest_documents(docs_dir: str = "../docs"):
 
     print(f"Processing {len(chunks)} chunks...")
 
-    # Store chunks in vector database
-    vector_service.store_chunks(chunks)
+    # Embed and upload through the vector service; flush so the chunks are searchable on return
+    vector_service.store_chunks(chunks, flush=True)
 
     print("Document ingestion completed successfully!")
 
@@ -1,15 +1,17 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+import httpx
 import os
-from middleware.rate_limiter import rate_limit_middleware
+from middleware.rate_limiter import RateLimiterMiddleware
 from utils.logging_config import logger
 
 # Load environment variables
 load_dotenv()
 
-# Import models to ensure tables are created
-from models.chat_models import create_tables
+from models.chat_models import missing_tables
 
 # Initialize the app
 app = FastAPI(
@@ -17,15 +19,36 @@ app = FastAPI(
     version=os.getenv("APP_VERSION", "1.0.0"),
     description="RAG Chatbot for Docusaurus-based book content",
     docs_url="/docs",  # Enable API documentation
-    redoc_url="/redoc"  # Enable ReDoc documentation
+    redoc_url="/redoc",  # Enable ReDoc documentation
+    default_response_class=ORJSONResponse  # Serialize JSON responses with orjson
 )
 
-# Create database tables on startup
+# Tables are created by scripts/migrate.py; workers only check that the schema is in place
 @app.on_event("startup")
-def startup_event():
-    logger.info("Initializing database tables...")
-    create_tables()
-    logger.info("Database tables initialized successfully")
+async def verify_schema():
+    try:
+        missing = await run_in_threadpool(missing_tables)
+    except Exception as e:
+        logger.error(f"Could not verify database schema: {str(e)}")
+        return
+    if missing:
+        logger.error(f"Database tables missing: {', '.join(missing)}. Run 'python scripts/migrate.py' first.")
+
+# Share one pooled HTTP/2 client for outbound calls so TLS connections are reused across requests
+@app.on_event("startup")
+async def create_http_client():
+    from services.llm_service import llm_service
+    # LLM completions can take a while to finish, so keep a long read timeout but fail fast on connect
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+    await llm_service.set_http_client(app.state.http)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,13 +60,7 @@ app.add_middleware(
 )
 
 # Add rate limiting middleware
-@app.middleware("http")
-async def add_rate_limiting(request, call_next):
-    from config.app_config import app_config
-    if app_config.rate_limit_enabled:
-        await rate_limit_middleware(request)
-    response = await call_next(request)
-    return response
+app.add_middleware(RateLimiterMiddleware)
 
 # Add logging middleware
 @app.middleware("http")
@@ -68,4 +85,16 @@ app.include_router(selected_text.router, prefix="/api")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        # Rate limits and caches are kept per process, so extra workers multiply the
+        # configured request rate and split cache hits; scale out deliberately with WORKERS
+        workers=int(os.getenv("WORKERS", "1")),
+        loop="uvloop",
+        http="httptools",
+        log_level="info",
+        access_log=False  # The logging middleware already records method, path, status and timing
+    )
\ No newline at end of file
@@ -1,37 +1,75 @@
 import time
 from typing import Dict, Optional
-from collections import defaultdict, deque
 from fastapi import Request, HTTPException
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from config.app_config import app_config
+from utils.cache import LRUCache
 
 class RateLimiter:
     def __init__(self):
-        # Store request timestamps for each identifier
-        self.requests: Dict[str, deque] = defaultdict(deque)
         self.window_size = app_config.rate_limit_window  # in seconds
         self.max_requests = app_config.rate_limit_requests
+        # Tokens refill continuously so an empty bucket is full again after one window
+        self.refill_rate = self.max_requests / self.window_size
+        # Token bucket per identifier as (tokens, last_seen); bounded so idle clients are evicted
+        self.buckets = LRUCache(max_size=100_000, ttl=self.window_size * 4)
 
     def is_allowed(self, identifier: str) -> bool:
         """
         Check if a request from the given identifier is allowed
         """
-        now = time.time()
-        window_start = now - self.window_size
+        now = time.monotonic()
+        tokens, last_seen = self.buckets.get(identifier) or (self.max_requests, now)
 
-        # Remove outdated requests
-        while self.requests[identifier] and self.requests[identifier][0] < window_start:
-            self.requests[identifier].popleft()
+        # Refill for the time elapsed since the last request, capped at the bucket size
+        tokens = min(self.max_requests, tokens + (now - last_seen) * self.refill_rate)
 
-        # Check if we're under the limit
-        if len(self.requests[identifier]) < self.max_requests:
-            self.requests[identifier].append(now)
+        if tokens >= 1:
+            self.buckets.put(identifier, (tokens - 1, now))
             return True
 
+        self.buckets.put(identifier, (tokens, now))
         return False
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
 
+def _rate_limit_detail() -> Dict[str, str]:
+    return {
+        "error": "rate_limited",
+        "message": f"Rate limit exceeded. Maximum {app_config.rate_limit_requests} requests per {app_config.rate_limit_window} seconds."
+    }
+
+class RateLimiterMiddleware:
+    """
+    Pure ASGI middleware applying the rate limiter to every HTTP request.
+    Unlike an @app.middleware("http") function it does not wrap the request in
+    BaseHTTPMiddleware, so an allowed request costs one bucket update and one call
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not app_config.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_id = client[0] if client else "unknown"
+
+        for name, value in scope["headers"]:
+            if name == b"user-id" or name == b"x-user-id":
+                client_id = f"{client_id}:{value.decode('latin-1')}"
+                break
+
+        if not rate_limiter.is_allowed(client_id):
+            response = ORJSONResponse(status_code=429, content={"detail": _rate_limit_detail()})
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
 async def rate_limit_middleware(request: Request):
     """
     Middleware function to apply rate limiting
@@ -48,13 +86,7 @@ async def rate_limit_middleware(request: Request):
         client_id = f"{client_id}:{user_id}"
 
     if not rate_limiter.is_allowed(client_id):
-        raise HTTPException(
-            status_code=429,
-            detail={
-                "error": "rate_limited",
-                "message": f"Rate limit exceeded. Maximum {app_config.rate_limit_requests} requests per {app_config.rate_limit_window} seconds."
-            }
-        )
+        raise HTTPException(status_code=429, detail=_rate_limit_detail())
 
 # Decorator for applying rate limiting to specific routes
 def with_rate_limit(func):
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, ForeignKey, ARRAY
+from sqlalchemy import create_engine, event, inspect, desc, text, Column, Integer, String, DateTime, Text, Boolean, ForeignKey, ARRAY, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.dialects.postgresql import UUID, JSONB
@@ -10,14 +10,57 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from config.app_config import app_config
+
 # Database URL from environment
 DATABASE_URL = os.getenv("NEON_DB_URL")
 if not DATABASE_URL:
     raise ValueError("NEON_DB_URL environment variable is required")
 
-# Create engine and session
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Use the psycopg 3 driver for plain postgres:// / postgresql:// URLs
+for _scheme in ("postgres://", "postgresql://"):
+    if DATABASE_URL.startswith(_scheme):
+        DATABASE_URL = "postgresql+psycopg://" + DATABASE_URL[len(_scheme):]
+        break
+
+# Prepared statements live on one server connection, but Neon's pooled endpoint (PgBouncer in
+# transaction mode) hands each transaction any backend, so they are only used on a direct endpoint
+DB_PREPARE_THRESHOLD = app_config.db_prepare_threshold
+if DB_PREPARE_THRESHOLD is not None and "-pooler." in DATABASE_URL:
+    print("WARNING: DB_PREPARE_THRESHOLD is ignored for the pooled Neon endpoint; use the direct endpoint to prepare statements.")
+    DB_PREPARE_THRESHOLD = None
+
+# Create engine and session; keep warm connections so requests skip the TCP+TLS handshake to Neon
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=app_config.db_pool_size,
+    max_overflow=app_config.db_max_overflow,
+    pool_recycle=app_config.db_pool_recycle,  # Recycle before the server side drops idle connections
+    pool_pre_ping=True,
+    pool_use_lifo=True,  # Reuse the most recent connection so surplus ones idle out
+    connect_args={
+        "sslmode": "require",
+        "keepalives": 1,
+        "keepalives_idle": 30,
+        # Off by default; with a direct endpoint, DB_PREPARE_THRESHOLD=1 prepares the handful of
+        # INSERTs and SELECTs a chat turn repeats so later executions skip parsing and planning
+        "prepare_threshold": DB_PREPARE_THRESHOLD
+    }
+)
+
+# Objects stay usable after commit without a reload; their primary keys are generated client-side
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+@event.listens_for(SessionLocal, "after_begin")
+def _set_transaction_settings(session, transaction, connection):
+    # Scoped to the transaction (set_config with is_local, i.e. SET LOCAL): behind Neon's
+    # pooled endpoint consecutive transactions may run on different backends, so
+    # session-level SETs would leak to other clients and be missing here.
+    # One statement keeps this to a single round trip per transaction
+    connection.exec_driver_sql(
+        "SELECT set_config('statement_timeout', %s, true), set_config('random_page_cost', '1.1', true)",
+        (str(int(app_config.db_statement_timeout)),)
+    )
 
 Base = declarative_base()
 
@@ -31,8 +74,16 @@ class ChatSession(Base):
     is_active = Column(Boolean, default=True)
     session_metadata = Column(JSONB)  # Renamed from 'metadata' to avoid SQLAlchemy reserved name
 
-    # Relationship to queries
-    queries = relationship("UserQuery", back_populates="session")
+    __table_args__ = (
+        # jsonb_path_ops GIN index serves @> containment filters and is smaller than the default jsonb_ops
+        Index("chat_sessions_metadata_gin", "session_metadata",
+              postgresql_using="gin", postgresql_ops={"session_metadata": "jsonb_path_ops"}),
+        # Serves get_recent_sessions without a sort
+        Index("ix_chat_sessions_user_updated", "user_id", desc("updated_at")),
+    )
+
+    # Relationship to queries; must be eager-loaded explicitly so history reads never issue N+1 SELECTs
+    queries = relationship("UserQuery", back_populates="session", lazy="raise")
 
 class UserQuery(Base):
     __tablename__ = "user_queries"
@@ -42,11 +93,19 @@ class UserQuery(Base):
     content = Column(Text, nullable=False)
     selected_text = Column(Text)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
-    context_chunks = Column(ARRAY(String))
+    context_chunks = Column(JSONB)  # List of chunk ids used for this query
 
-    # Relationship to session and responses
+    __table_args__ = (
+        # Serves get_session_queries (latest queries of a session) as an index scan without a sort
+        Index("ix_user_queries_session_ts", "session_id", desc("timestamp")),
+        # Serves "which queries used chunk X" containment lookups
+        Index("ix_user_queries_ctx_gin", "context_chunks",
+              postgresql_using="gin", postgresql_ops={"context_chunks": "jsonb_path_ops"}),
+    )
+
+    # Relationship to session and responses; responses must be eager-loaded explicitly
     session = relationship("ChatSession", back_populates="queries")
-    responses = relationship("Response", back_populates="query")
+    responses = relationship("Response", back_populates="query", lazy="raise")
 
 class Response(Base):
     __tablename__ = "responses"
@@ -54,20 +113,59 @@ class Response(Base):
     response_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     query_id = Column(UUID(as_uuid=True), ForeignKey("user_queries.query_id"), nullable=False)
     content = Column(Text, nullable=False)
-    source_chunks = Column(ARRAY(String))
+    source_chunks = Column(JSONB)  # List of chunk ids used to generate the response
     confidence_score = Column(Integer)  # Using Integer for simplicity (0-100 scale)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     token_count = Column(Integer)
     validation_result = Column(JSONB)  # Store validation result as JSON
 
+    __table_args__ = (
+        Index("responses_validation_result_gin", "validation_result",
+              postgresql_using="gin", postgresql_ops={"validation_result": "jsonb_path_ops"}),
+        Index("ix_responses_source_chunks_gin", "source_chunks",
+              postgresql_using="gin", postgresql_ops={"source_chunks": "jsonb_path_ops"}),
+    )
+
     # Relationship to query
     query = relationship("UserQuery", back_populates="responses")
 
+# Chunk id columns that were created as text arrays before they moved to JSONB
+_JSONB_CHUNK_COLUMNS = (("user_queries", "context_chunks"), ("responses", "source_chunks"))
+
+def _convert_chunk_columns_to_jsonb(conn):
+    inspector = inspect(conn)
+    for table_name, column_name in _JSONB_CHUNK_COLUMNS:
+        columns = {column["name"]: column for column in inspector.get_columns(table_name)}
+        if isinstance(columns[column_name]["type"], ARRAY):
+            conn.execute(text(
+                f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                f"TYPE JSONB USING to_jsonb({column_name})"
+            ))
+
 # Create tables
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Column rewrites and index builds can take far longer than a request query;
+        # lift any statement timeout for this transaction so a migration never stops halfway
+        conn.execute(text("SET LOCAL statement_timeout = 0"))
+        Base.metadata.create_all(bind=conn)
+        _convert_chunk_columns_to_jsonb(conn)
+        # create_all skips existing tables, so add indexes declared after a table was created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+def missing_tables() -> List[str]:
+    """
+    Return the names of model tables that do not exist in the database yet
+    """
+    existing = set(inspect(engine).get_table_names())
+    return [name for name in Base.metadata.tables if name not in existing]
 
-# Dependency to get DB session
+# Dependency to get DB session; one transaction per request. Routes commit it themselves
+# before responding: FastAPI runs dependency teardown after the response is sent, so a
+# commit here would let clients see ids that are not stored yet and would hide failed
+# commits. Anything left uncommitted is rolled back when the session closes
 def get_db():
     db = SessionLocal()
     try:
@@ -17,7 +17,7 @@ CREATE TABLE IF NOT EXISTS user_queries (
     content TEXT NOT NULL,
     selected_text TEXT,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    context_chunks TEXT[] -- Array of chunk IDs used for this query
+    context_chunks JSONB -- Array of chunk IDs used for this query
 );
 
 -- Responses table
@@ -25,7 +25,7 @@ CREATE TABLE IF NOT EXISTS responses (
     response_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     query_id UUID REFERENCES user_queries(query_id) ON DELETE CASCADE,
     content TEXT NOT NULL,
-    source_chunks TEXT[], -- Array of chunk IDs used to generate the response
+    source_chunks JSONB, -- Array of chunk IDs used to generate the response
     confidence_score DECIMAL(3, 2),
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     token_count INTEGER
@@ -37,4 +37,8 @@ CREATE INDEX IF NOT EXISTS idx_user_queries_timestamp ON user_queries(timestamp)
 CREATE INDEX IF NOT EXISTS idx_responses_query_id ON responses(query_id);
 CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses(timestamp);
 CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_id ON chat_sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions(updated_at);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions(updated_at);
+CREATE INDEX IF NOT EXISTS ix_user_queries_session_ts ON user_queries(session_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_updated ON chat_sessions(user_id, updated_at DESC);
+CREATE INDEX IF NOT EXISTS ix_user_queries_ctx_gin ON user_queries USING GIN (context_chunks jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS ix_responses_source_chunks_gin ON responses USING GIN (source_chunks jsonb_path_ops);
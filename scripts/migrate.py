@@ -0,0 +1,18 @@
+"""
+Create the database tables. Run once per deploy, before starting the API workers:
+
+    python scripts/migrate.py
+"""
+import os
+import sys
+
+# Allow running as a plain script from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.chat_models import create_tables
+from utils.logging_config import logger
+
+if __name__ == "__main__":
+    logger.info("Initializing database tables...")
+    create_tables()
+    logger.info("Database tables initialized successfully")
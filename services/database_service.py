@@ -1,10 +1,16 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import cast, insert
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session, selectinload
 from models.chat_models import ChatSession, UserQuery, Response, get_db
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 import uuid
 
 class DatabaseService:
+    """
+    Chat history reads and writes. Writes are only added to the given session;
+    the route commits the request's transaction once, before it responds
+    """
     def __init__(self):
         pass
 
@@ -13,12 +19,11 @@ class DatabaseService:
         Create a new chat session
         """
         session = ChatSession(
+            session_id=uuid.uuid4(),  # Generated client-side so the id is known before the insert
             user_id=user_id,
             session_metadata=metadata or {}
         )
         db.add(session)
-        db.commit()
-        db.refresh(session)
         return session
 
     def get_session(self, db: Session, session_id: UUID) -> Optional[ChatSession]:
@@ -32,14 +37,13 @@ class DatabaseService:
         Create a new user query in the database
         """
         query = UserQuery(
+            query_id=uuid.uuid4(),
             session_id=session_id,
             content=content,
             selected_text=selected_text,
             context_chunks=context_chunks or []
         )
         db.add(query)
-        db.commit()
-        db.refresh(query)
         return query
 
     def create_response(self, db: Session, query_id: UUID, content: str, source_chunks: Optional[List[str]] = None, confidence_score: Optional[int] = None, token_count: Optional[int] = None, validation_result: Optional[Dict[str, Any]] = None) -> Response:
@@ -47,6 +51,7 @@ class DatabaseService:
         Create a new response in the database
         """
         response = Response(
+            response_id=uuid.uuid4(),
             query_id=query_id,
             content=content,
             source_chunks=source_chunks or [],
@@ -55,15 +60,22 @@ class DatabaseService:
             validation_result=validation_result
         )
         db.add(response)
-        db.commit()
-        db.refresh(response)
         return response
 
+    def bulk_create_responses(self, db: Session, rows: List[Dict[str, Any]]):
+        """
+        Insert many responses with one executemany; SQLAlchemy sends them as
+        multi-row INSERT ... VALUES statements
+        """
+        if not rows:
+            return
+        db.execute(insert(Response), rows)
+
     def get_session_queries(self, db: Session, session_id: UUID, limit: int = 50) -> List[UserQuery]:
         """
-        Get all queries for a specific session
+        Get all queries for a specific session, with their responses loaded in one extra SELECT
         """
-        return db.query(UserQuery).filter(
+        return db.query(UserQuery).options(selectinload(UserQuery.responses)).filter(
             UserQuery.session_id == session_id
         ).order_by(UserQuery.timestamp.desc()).limit(limit).all()
 
@@ -71,17 +83,26 @@ class DatabaseService:
         """
         Get a query with its corresponding response
         """
-        query = db.query(UserQuery).filter(UserQuery.query_id == query_id).first()
+        query = db.query(UserQuery).options(
+            selectinload(UserQuery.responses)
+        ).filter(UserQuery.query_id == query_id).first()
         if not query:
             return None
 
-        response = db.query(Response).filter(Response.query_id == query_id).first()
-
         return {
             'query': query,
-            'response': response
+            'response': query.responses[0] if query.responses else None
         }
 
+    def get_queries_using_chunk(self, db: Session, chunk_id: str, limit: int = 50) -> List[UserQuery]:
+        """
+        Get the queries whose context included the given chunk, newest first.
+        Uses JSONB containment (@>) so the lookup can be served by the GIN index
+        """
+        return db.query(UserQuery).filter(
+            UserQuery.context_chunks.op("@>")(cast([chunk_id], JSONB))
+        ).order_by(UserQuery.timestamp.desc()).limit(limit).all()
+
     def get_recent_sessions(self, db: Session, user_id: str, limit: int = 10) -> List[ChatSession]:
         """
         Get recent sessions for a specific user
@@ -90,6 +111,15 @@ class DatabaseService:
             ChatSession.user_id == user_id
         ).order_by(ChatSession.updated_at.desc()).limit(limit).all()
 
+    def get_sessions_by_metadata(self, db: Session, criteria: Dict[str, Any], limit: int = 50) -> List[ChatSession]:
+        """
+        Get sessions whose metadata contains all the given key/value pairs.
+        Uses JSONB containment (@>) so the filter can be served by the GIN index
+        """
+        return db.query(ChatSession).filter(
+            ChatSession.session_metadata.op("@>")(cast(criteria, JSONB))
+        ).order_by(ChatSession.updated_at.desc()).limit(limit).all()
+
     def update_session_metadata(self, db: Session, session_id: UUID, metadata: Dict) -> ChatSession:
         """
         Update session metadata
@@ -97,8 +127,6 @@ class DatabaseService:
         session = self.get_session(db, session_id)
         if session:
             session.session_metadata = metadata
-            db.commit()
-            db.refresh(session)
         return session
 
 # Global instance
@@ -1,34 +1,97 @@
 import cohere
+import httpx
 from typing import List, Dict, Any
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.batching import MicroBatcher
+from utils.cache import embedding_cache
 
 # Load environment variables
 load_dotenv()
 
+# Most texts the Cohere embed endpoint accepts per request
+COHERE_MAX_BATCH = 96
+
 class CohereEmbeddingService:
     def __init__(self):
         api_key = os.getenv("COHERE_API_KEY")
         if not api_key:
             raise ValueError("COHERE_API_KEY environment variable is required")
-        self.client = cohere.Client(api_key)
+        # Keep-alive HTTP/2 connections are reused across embed calls and threads
+        self.client = cohere.Client(
+            api_key,
+            httpx_client=httpx.Client(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=5.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+            )
+        )
         self.model = "embed-multilingual-v3.0"  # Using the recommended model
+        # Concurrent single-text requests from the API are coalesced into one embed call
+        self.batcher = MicroBatcher(self.generate_embeddings, max_batch=32, max_wait=0.005)
+        # Embed requests are IO-bound, so independent batches are sent from threads in parallel
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="cohere-embed")
 
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def _embed(self, texts: List[str], input_type: str) -> List[List[float]]:
         """
-        Generate embeddings for a list of texts using Cohere API
+        Embed at most COHERE_MAX_BATCH texts in one Cohere API call
         """
         try:
             response = self.client.embed(
                 texts=texts,
                 model=self.model,
-                input_type="search_document"  # Using search_document for knowledge base
+                input_type=input_type  # Using search_document for knowledge base
             )
-            return [embedding for embedding in response.embeddings]
+            return response.embeddings
         except Exception as e:
             print(f"Error generating embeddings: {str(e)}")
             raise e
 
+    def generate_embeddings(self, texts: List[str], input_type: str = "search_document",
+                            batch_size: int = COHERE_MAX_BATCH, use_cache: bool = True) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts using Cohere API.
+        Texts embedded recently are served from the cache; the rest are deduplicated and
+        sent in batches of at most batch_size, in parallel when there is more than one.
+        Ingestion passes use_cache=False so document chunks do not evict query embeddings
+        """
+        cache_keys = [self._cache_key(text, input_type) for text in texts]
+        if use_cache:
+            embeddings = [embedding_cache.get(key) for key in cache_keys]
+        else:
+            embeddings = [None] * len(texts)
+
+        # Each distinct uncached text is embedded once, however often it repeats
+        positions: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                positions.setdefault(texts[i], []).append(i)
+        if not positions:
+            return embeddings
+
+        unique_texts = list(positions)
+        batches = [unique_texts[start:start + batch_size] for start in range(0, len(unique_texts), batch_size)]
+        if len(batches) == 1:
+            batch_results = [self._embed(batches[0], input_type)]
+        else:
+            batch_results = list(self.executor.map(lambda batch: self._embed(batch, input_type), batches))
+
+        # Scatter the fresh embeddings back in input order
+        for batch, results in zip(batches, batch_results):
+            for text, embedding in zip(batch, results):
+                indices = positions[text]
+                if use_cache:
+                    embedding_cache.put(cache_keys[indices[0]], embedding)
+                for i in indices:
+                    embeddings[i] = embedding
+        return embeddings
+
+    def _cache_key(self, text: str, input_type: str = "search_document") -> str:
+        digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+        return f"{self.model}:{input_type}:{digest}"
+
     def embed_single_text(self, text: str) -> List[float]:
         """
         Generate embedding for a single text
@@ -36,5 +99,17 @@ class CohereEmbeddingService:
         embeddings = self.generate_embeddings([text])
         return embeddings[0] if embeddings else []
 
+    async def aembed(self, text: str) -> List[float]:
+        """
+        Generate embedding for a single text from async code, batching it with
+        other in-flight requests on a cache miss
+        """
+        # Serve cache hits without waiting for a batch
+        cached = embedding_cache.get(self._cache_key(text))
+        if cached is not None:
+            return cached
+
+        return await self.batcher.submit(text)
+
 # Global instance
 embedding_service = CohereEmbeddingService()
\ No newline at end of file
@@ -1,13 +1,20 @@
 import openai
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import os
 from dotenv import load_dotenv
-import requests
+import httpx
+import time
+import hashlib
 import json
+from utils.cache import llm_cache
 
 # Load environment variables
 load_dotenv()
 
+# Extra attempts for a completion that fails with a 5xx status, with exponential backoff
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5  # seconds before the first retry
+
 class OpenRouterLLMService:
     def __init__(self):
         api_key = os.getenv("OPENROUTER_API_KEY")
@@ -17,14 +24,64 @@ class OpenRouterLLMService:
         self.api_key = api_key
         self.base_url = "https://openrouter.ai/api/v1"
         self.default_model = "openai/gpt-3.5-turbo"  # Using a more commonly available model
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
 
-    def generate_response(self,
-                         context: str,
-                         query: str,
-                         selected_text: Optional[str] = None,
-                         model: Optional[str] = None) -> str:
+        # Static parts of the prompts, built once; each request only appends its dynamic text.
+        # The continuation lines keep the 12-space indent the prompts have always been sent with
+        self._sys_selected_prefix = (
+            "You are a helpful assistant for the Docusaurus book. Answer questions based only on the provided selected text.\n"
+            "            Do not use any external knowledge or information beyond what is provided in the selected text.\n"
+            "            If the answer is not found in the provided text, respond with: 'This information is not available in the book.'\n"
+            "            Do not make up information or infer beyond what is explicitly stated in the selected text.\n"
+            "\n"
+            "            Selected text: "
+        )
+        self._sys_context_prefix = (
+            "You are a helpful assistant for the Docusaurus book. Answer questions based only on the provided book content.\n"
+            "            Do not use any external knowledge or information beyond what is provided in the context.\n"
+            "            If the answer is not found in the provided context, respond with: 'This information is not available in the book.'\n"
+            "            Do not make up information or infer beyond what is explicitly stated in the context.\n"
+            "\n"
+            "            Context: "
+        )
+        self._user_suffix = (
+            "\n\nPlease provide a helpful and accurate answer based only on the information provided above. "
+            "Do not include any information not explicitly mentioned in the provided text."
+        )
+
+        # Pooled HTTP/2 client reused across requests so connections stay warm;
+        # the app replaces it with its shared client at startup
+        self.async_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+
+        # Pooled client for the synchronous path; connection failures are retried by the transport
+        self.http_client = httpx.Client(
+            transport=httpx.HTTPTransport(http2=True, retries=MAX_RETRIES),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+
+    async def set_http_client(self, client: httpx.AsyncClient):
         """
-        Generate a response based on the provided context and query
+        Use a shared async HTTP client for all OpenRouter calls, closing the one it replaces
+        """
+        previous, self.async_client = self.async_client, client
+        if previous is not client:
+            await previous.aclose()
+
+    def _build_request(self,
+                       context: str,
+                       query: str,
+                       selected_text: Optional[str] = None,
+                       model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the OpenRouter chat completion payload for the given context and query
         If selected_text is provided, restrict the answer to only that text
         """
         model = model or self.default_model
@@ -32,29 +89,14 @@ class OpenRouterLLMService:
         # Create the prompt based on whether we have selected text
         if selected_text:
             # Restrict to selected text only
-            system_message = f"""You are a helpful assistant for the Docusaurus book. Answer questions based only on the provided selected text.
-            Do not use any external knowledge or information beyond what is provided in the selected text.
-            If the answer is not found in the provided text, respond with: 'This information is not available in the book.'
-            Do not make up information or infer beyond what is explicitly stated in the selected text.
-
-            Selected text: {selected_text}"""
+            system_message = self._sys_selected_prefix + selected_text
         else:
             # Use broader context
-            system_message = f"""You are a helpful assistant for the Docusaurus book. Answer questions based only on the provided book content.
-            Do not use any external knowledge or information beyond what is provided in the context.
-            If the answer is not found in the provided context, respond with: 'This information is not available in the book.'
-            Do not make up information or infer beyond what is explicitly stated in the context.
-
-            Context: {context}"""
+            system_message = self._sys_context_prefix + context
 
-        user_message = f"Question: {query}\n\nPlease provide a helpful and accurate answer based only on the information provided above. Do not include any information not explicitly mentioned in the provided text."
+        user_message = "Question: " + query + self._user_suffix
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
-        data = {
+        return {
             "model": model,
             "messages": [
                 {"role": "system", "content": system_message},
@@ -64,10 +106,79 @@ class OpenRouterLLMService:
             "max_tokens": 1000
         }
 
+    def _cache_key(self, data: Dict[str, Any]) -> str:
+        """
+        Key a completion by the model and the exact messages sent to it
+        """
+        messages = data["messages"]
+        key_input = "\0".join((data["model"], messages[0]["content"], messages[1]["content"]))
+        return hashlib.blake2b(key_input.encode()).hexdigest()
+
+    def generate_response(self,
+                         context: str,
+                         query: str,
+                         selected_text: Optional[str] = None,
+                         model: Optional[str] = None,
+                         use_cache: bool = True) -> str:
+        """
+        Generate a response based on the provided context and query
+        If selected_text is provided, restrict the answer to only that text
+        """
+        data = self._build_request(context, query, selected_text, model)
+
+        cache_key = self._cache_key(data)
+        if use_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            response = requests.post(
+            for attempt in range(MAX_RETRIES + 1):
+                response = self.http_client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json=data
+                )
+                if response.status_code < 500 or attempt == MAX_RETRIES:
+                    break
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+            response.raise_for_status()
+            result = response.json()
+
+            # Extract the content from the response
+            content = result['choices'][0]['message']['content']
+            llm_cache.put(cache_key, content)
+            return content
+
+        except httpx.HTTPError as e:
+            print(f"Error calling OpenRouter API: {str(e)}")
+            if isinstance(e, httpx.HTTPStatusError):
+                print(f"Response content: {e.response.content}")
+            raise e
+        except Exception as e:
+            print(f"Unexpected error in OpenRouter API call: {str(e)}")
+            raise e
+
+    async def agenerate_response(self,
+                                 context: str,
+                                 query: str,
+                                 selected_text: Optional[str] = None,
+                                 model: Optional[str] = None) -> str:
+        """
+        Async variant of generate_response that does not block the event loop
+        """
+        data = self._build_request(context, query, selected_text, model)
+
+        cache_key = self._cache_key(data)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.async_client.post(
                 f"{self.base_url}/chat/completions",
-                headers=headers,
+                headers=self.headers,
                 json=data
             )
 
@@ -76,17 +187,73 @@ class OpenRouterLLMService:
 
             # Extract the content from the response
             content = result['choices'][0]['message']['content']
+            llm_cache.put(cache_key, content)
             return content
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPStatusError as e:
             print(f"Error calling OpenRouter API: {str(e)}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"Response content: {e.response.content}")
+            print(f"Response content: {e.response.content}")
             raise e
         except Exception as e:
             print(f"Unexpected error in OpenRouter API call: {str(e)}")
             raise e
 
+    async def astream_response(self,
+                               context: str,
+                               query: str,
+                               selected_text: Optional[str] = None,
+                               model: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream the response text deltas as OpenRouter generates them
+        """
+        data = self._build_request(context, query, selected_text, model)
+
+        # A cached completion is sent as a single delta
+        cache_key = self._cache_key(data)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        data["stream"] = True
+        parts = []
+        done = False
+
+        try:
+            async with self.async_client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=data
+            ) as response:
+                response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    # Skip blank separators and SSE comments (OpenRouter sends keep-alive comments)
+                    if not line.startswith("data: "):
+                        continue
+
+                    payload = line[len("data: "):]
+                    if payload == "[DONE]":
+                        done = True
+                        break
+
+                    delta = json.loads(payload)['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+
+            # A stream that ended early or produced no text would be replayed as the answer
+            if done and parts:
+                llm_cache.put(cache_key, "".join(parts))
+
+        except httpx.HTTPStatusError as e:
+            print(f"Error calling OpenRouter API: {str(e)}")
+            raise e
+        except Exception as e:
+            print(f"Unexpected error in OpenRouter streaming call: {str(e)}")
+            raise e
+
     def check_content_availability(self, context: str, query: str) -> bool:
         """
         Check if the context contains information relevant to the query
@@ -97,21 +264,21 @@ class OpenRouterLLMService:
 
         # Simple check: see if context contains relevant terms from query
         context_lower = context.lower()
-        query_lower = query.lower()
-
-        # Split query into words and check if some appear in context
-        query_words = [word for word in query_lower.split() if len(word) > 3]  # Only consider words longer than 3 chars
+        query_words = [word for word in query.lower().split() if len(word) > 3]  # Only consider words longer than 3 chars
+        if not query_words:
+            return True  # If no meaningful words, assume relevant
 
+        # Substring scans run in C; stop as soon as enough words have been found
+        needed = 0.3 * len(query_words)
         matches = 0
         for word in query_words:
             if word in context_lower:
                 matches += 1
+                if matches >= needed:
+                    return True
 
-        # If at least 30% of meaningful words from query appear in context, consider it relevant
-        if len(query_words) > 0:
-            return (matches / len(query_words)) >= 0.3
-        else:
-            return True  # If no meaningful words, assume relevant
+        # Fewer than 30% of meaningful words from query appear in context
+        return False
 
 # Global instance
 llm_service = OpenRouterLLMService()
\ No newline at end of file
@@ -44,7 +44,7 @@ class RAGService:
                 selected_text=selected_text
             )
 
-            # Step 4: Store the interaction in the database
+            # Step 4: Store the interaction in the database; the caller's transaction commits both rows
             # First, create the user query
             from uuid import UUID
             session_uuid = UUID(session_id)
@@ -6,11 +6,37 @@ class RetrievalService:
     def __init__(self):
         self.vector_service = vector_service
 
-    def retrieve_relevant_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None) -> List[Dict[str, Any]]:
+    def retrieve_relevant_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None,
+                                 query_embedding: Optional[List[float]] = None,
+                                 hnsw_ef: Optional[int] = None,
+                                 document_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Retrieve the most relevant chunks for a given query
         """
-        return self.vector_service.search_chunks(query, top_k, selected_text)
+        return self.vector_service.search_chunks(
+            query,
+            top_k,
+            selected_text,
+            query_embedding=query_embedding,
+            hnsw_ef=hnsw_ef,
+            document_id=document_id
+        )
+
+    async def aretrieve_relevant_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None,
+                                        query_embedding: Optional[List[float]] = None,
+                                        hnsw_ef: Optional[int] = None,
+                                        document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Retrieve the most relevant chunks without blocking the event loop
+        """
+        return await self.vector_service.asearch_chunks(
+            query,
+            top_k,
+            selected_text,
+            query_embedding=query_embedding,
+            hnsw_ef=hnsw_ef,
+            document_id=document_id
+        )
 
     def retrieve_with_context(self, query: str, top_k: int = 5, context_window: int = 2) -> List[Dict[str, Any]]:
         """
@@ -44,13 +70,12 @@ class RetrievalService:
         """
         Convert a list of chunks to a single context string for LLM
         """
-        context_parts = []
-        for chunk in chunks:
-            context_part = f"Source: {chunk['source_path']} | Chapter: {chunk['chapter']} | Section: {chunk['section']}\n"
-            context_part += f"Content: {chunk['content']}\n"
-            context_parts.append(context_part)
-
-        return "\n---\n".join(context_parts)
+        # One f-string per chunk builds each part in a single allocation
+        return "\n---\n".join(
+            f"Source: {chunk['source_path']} | Chapter: {chunk['chapter']} | Section: {chunk['section']}\n"
+            f"Content: {chunk['content']}\n"
+            for chunk in chunks
+        )
 
 # Global instance
 retrieval_service = RetrievalService()
\ No newline at end of file
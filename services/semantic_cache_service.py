@@ -0,0 +1,178 @@
+import time
+import uuid
+from typing import List, Dict, Any, Optional
+from qdrant_client.http import models
+from config.app_config import app_config
+from utils.cache import get_cache_key
+from .vector_service import vector_service
+
+class SemanticCacheService:
+    """
+    Cache of LLM responses keyed by query embedding similarity, stored in a Qdrant collection
+    so paraphrased questions can reuse a previous answer
+    """
+    def __init__(self):
+        self.client = vector_service.client
+        self.aclient = vector_service.aclient
+        self.collection_name = app_config.semantic_cache_collection
+        self.threshold = app_config.semantic_cache_threshold
+        self.ttl = app_config.cache_ttl
+        self.enabled = app_config.cache_enabled
+
+        if self.enabled:
+            vector_service._ensure_collection_exists(
+                self.collection_name,
+                payload_indexes={
+                    "selected_text_key": models.PayloadSchemaType.KEYWORD,
+                    "created_at": models.PayloadSchemaType.FLOAT
+                }
+            )
+
+    def _selected_text_key(self, selected_text: Optional[str]) -> str:
+        """
+        Answers about selected text are only reusable for the exact same selection
+        """
+        return get_cache_key(selected_text) if selected_text else ""
+
+    def _lookup_filter(self, selected_text: Optional[str]) -> models.Filter:
+        """
+        Only match entries for the same selection that have not expired yet
+        """
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="selected_text_key",
+                    match=models.MatchValue(value=self._selected_text_key(selected_text))
+                ),
+                models.FieldCondition(
+                    key="created_at",
+                    range=models.Range(gte=time.time() - self.ttl)
+                )
+            ]
+        )
+
+    def lookup(self, query_embedding: List[float], selected_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached response of the most similar previous query, if it is close enough and not expired
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            hits = self.client.search(
+                collection_name=self.collection_name,
+                query_vector=query_embedding,
+                limit=1,
+                query_filter=self._lookup_filter(selected_text),
+                score_threshold=self.threshold,
+                with_payload=True
+            )
+        except Exception as e:
+            print(f"Error reading semantic cache: {str(e)}")
+            return None
+
+        if not hits:
+            return None
+
+        return hits[0].payload.get('response')
+
+    async def alookup(self, query_embedding: List[float], selected_text: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of lookup using the async Qdrant client
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            hits = await self.aclient.search(
+                collection_name=self.collection_name,
+                query_vector=query_embedding,
+                limit=1,
+                query_filter=self._lookup_filter(selected_text),
+                score_threshold=self.threshold,
+                with_payload=True
+            )
+        except Exception as e:
+            print(f"Error reading semantic cache: {str(e)}")
+            return None
+
+        if not hits:
+            return None
+
+        return hits[0].payload.get('response')
+
+    def _build_point(self, query_embedding: List[float], query: str, response: Dict[str, Any],
+                     selected_text: Optional[str]) -> models.PointStruct:
+        return models.PointStruct(
+            id=str(uuid.uuid4()),
+            vector=query_embedding,
+            payload={
+                'query': query,
+                'selected_text_key': self._selected_text_key(selected_text),
+                'response': response,
+                'created_at': time.time()
+            }
+        )
+
+    def _expired_selector(self) -> models.FilterSelector:
+        return models.FilterSelector(
+            filter=models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="created_at",
+                        range=models.Range(lt=time.time() - self.ttl)
+                    )
+                ]
+            )
+        )
+
+    def store(self, query_embedding: List[float], query: str, response: Dict[str, Any],
+              selected_text: Optional[str] = None):
+        """
+        Store a generated response under the embedding of the query that produced it
+        """
+        if not self.enabled:
+            return
+
+        try:
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[self._build_point(query_embedding, query, response, selected_text)]
+            )
+            self.purge_expired()
+        except Exception as e:
+            print(f"Error writing semantic cache: {str(e)}")
+
+    async def astore(self, query_embedding: List[float], query: str, response: Dict[str, Any],
+                     selected_text: Optional[str] = None):
+        """
+        Async variant of store using the async Qdrant client
+        """
+        if not self.enabled:
+            return
+
+        try:
+            await self.aclient.upsert(
+                collection_name=self.collection_name,
+                points=[self._build_point(query_embedding, query, response, selected_text)]
+            )
+            await self.aclient.delete(
+                collection_name=self.collection_name,
+                points_selector=self._expired_selector(),
+                wait=False
+            )
+        except Exception as e:
+            print(f"Error writing semantic cache: {str(e)}")
+
+    def purge_expired(self):
+        """
+        Remove cache entries older than the configured TTL
+        """
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=self._expired_selector(),
+            wait=False
+        )
+
+# Global instance
+semantic_cache_service = SemanticCacheService()
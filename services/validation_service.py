@@ -1,6 +1,17 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, FrozenSet
+from functools import lru_cache
 import re
 
+# Word tokens; punctuation is not part of a word
+_WORD_RE = re.compile(r"\w+")
+
+@lru_cache(maxsize=256)
+def _selected_word_set(selected_lower: str) -> FrozenSet[str]:
+    """
+    Distinct words of a selected text; follow-up questions about the same selection reuse the set
+    """
+    return frozenset(_WORD_RE.findall(selected_lower))
+
 class ValidationService:
     def __init__(self):
         # Phrases that indicate the response acknowledges lack of information in the book
@@ -14,6 +25,26 @@ class ValidationService:
             "not specified in the book"
         ]
 
+        # Phrases that indicate the response is too generic or draws on external knowledge
+        self.generic_indicators = [
+            r"generally.*",
+            r"in general.*",
+            r"typically.*",
+            r"usually.*",
+            r"most.*",
+            r"many.*",
+            r"external sources.*",
+            r"other sources.*",
+            r"from external knowledge.*"
+        ]
+
+        # Each phrase list is scanned with one precompiled alternation; inputs are
+        # lowercased first, so no IGNORECASE is needed
+        self._absence_re = re.compile("|".join(re.escape(phrase) for phrase in self.known_absence_phrases))
+        # Each indicator is a plain phrase followed by ".*", so a substring test matches exactly
+        # when the pattern would, and every matching indicator can be reported
+        self._generic_phrases = [(indicator, indicator[:-2]) for indicator in self.generic_indicators]
+
     def validate_book_based_response(self, response: str, context_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Validate that the response is grounded in the book content
@@ -26,7 +57,7 @@ class ValidationService:
 
         # Check if response contains known absence phrases
         response_lower = response.lower()
-        has_absence_indicator = any(phrase in response_lower for phrase in self.known_absence_phrases)
+        has_absence_indicator = self._absence_re.search(response_lower) is not None
 
         if has_absence_indicator:
             # If the response indicates info is not available, that's valid
@@ -35,20 +66,8 @@ class ValidationService:
             return validation_result
 
         # Check if response is too generic or contains external knowledge indicators
-        generic_indicators = [
-            r"generally.*",
-            r"in general.*",
-            r"typically.*",
-            r"usually.*",
-            r"most.*",
-            r"many.*",
-            r"external sources.*",
-            r"other sources.*",
-            r"from external knowledge.*"
-        ]
-
-        for indicator in generic_indicators:
-            if re.search(indicator, response_lower, re.IGNORECASE):
+        for indicator, phrase in self._generic_phrases:
+            if phrase in response_lower:
                 validation_result['issues'].append(f"Response contains generic knowledge indicator: {indicator}")
                 validation_result['is_valid'] = False
                 validation_result['confidence'] = 0.3
@@ -80,7 +99,7 @@ class ValidationService:
 
         # Check if response contains known absence phrases
         response_lower = response.lower()
-        has_absence_indicator = any(phrase in response_lower for phrase in self.known_absence_phrases)
+        has_absence_indicator = self._absence_re.search(response_lower) is not None
 
         if has_absence_indicator:
             validation_result['confidence'] = 0.9
@@ -96,13 +115,12 @@ class ValidationService:
         # to check if the response aligns with the selected text content
         if selected_text and len(response.strip()) > 20:
             # Check if response contains key terms from selected text
-            selected_lower = selected_text.lower()
-            response_words = set(response_lower.split())
-            selected_words = set(selected_lower.split())
+            response_words = set(_WORD_RE.findall(response_lower))
+            selected_words = _selected_word_set(selected_text.lower())
 
             # Calculate overlap
             if selected_words:
-                overlap = len(response_words.intersection(selected_words))
+                overlap = len(selected_words.intersection(response_words))
                 total_response_words = len(response_words)
 
                 if total_response_words > 0 and (overlap / total_response_words) < 0.1:
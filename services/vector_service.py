@@ -1,13 +1,33 @@
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from .embedding_service import embedding_service
+from config.app_config import app_config
+from utils.cache import search_cache, get_cache_key
+from .embedding_service import embedding_service, COHERE_MAX_BATCH
 
 # Load environment variables
 load_dotenv()
 
+# HNSW ef values for the accuracy levels exposed by the search API
+HNSW_EF_BY_ACCURACY = {
+    "fast": 64,
+    "balanced": 128,
+    "accurate": 256
+}
+
+# Payload fields of the chunk collection that can be used in search filters
+CHUNK_PAYLOAD_INDEXES = {
+    field_name: models.PayloadSchemaType.KEYWORD
+    for field_name in ("document_id", "title", "chapter", "section", "source_path")
+}
+
+# Payload fields returned with search hits; the chunk position fields are never read from search results
+SEARCH_PAYLOAD_FIELDS = ["content", "document_id", "title", "source_path", "chapter", "section"]
+
 class QdrantVectorService:
     def __init__(self):
         url = os.getenv("QDRANT_URL")
@@ -19,102 +39,201 @@ class QdrantVectorService:
         if not api_key:
             raise ValueError("QDRANT_API_KEY environment variable is required")
 
+        # gRPC sends vectors as binary protobuf instead of JSON arrays and keeps one
+        # multiplexed channel open, so calls skip per-request connection setup
         self.client = QdrantClient(
             url=url,
             api_key=api_key,
-            prefer_grpc=False  # Using HTTP for compatibility
+            prefer_grpc=True,
+            grpc_port=6334,
+            timeout=30
+        )
+        # Async client for the API routes, so searches run on the event loop instead of the threadpool
+        self.aclient = AsyncQdrantClient(
+            url=url,
+            api_key=api_key,
+            prefer_grpc=True,
+            grpc_port=6334,
+            timeout=30
         )
         self.collection_name = collection_name
         self._ensure_collection_exists()
 
-    def _ensure_collection_exists(self):
+    def _ensure_collection_exists(self, collection_name: Optional[str] = None,
+                                  payload_indexes: Optional[Dict[str, models.PayloadSchemaType]] = None):
         """
         Ensure the collection exists with proper configuration
+        payload_indexes maps payload fields used in filters to their index type;
+        it defaults to the filterable fields of the chunk collection
         """
+        collection_name = collection_name or self.collection_name
+        if payload_indexes is None:
+            payload_indexes = CHUNK_PAYLOAD_INDEXES
         try:
             # Check if collection exists
-            self.client.get_collection(self.collection_name)
+            self.client.get_collection(collection_name)
         except:
             # Create collection if it doesn't exist
             self.client.create_collection(
-                collection_name=self.collection_name,
+                collection_name=collection_name,
                 vectors_config=models.VectorParams(
                     size=1024,  # Cohere's embed-multilingual-v3.0 returns 1024-dim vectors
-                    distance=models.Distance.COSINE
+                    distance=models.Distance.COSINE,
+                    on_disk=True  # Full-precision vectors are only read for rescoring
+                ),
+                # Denser graph for 1024-dim vectors: fewer hops per search and better recall
+                hnsw_config=models.HnswConfigDiff(
+                    m=32,
+                    ef_construct=200,
+                    full_scan_threshold=10000
+                ),
+                # int8 copies of the vectors are kept in RAM for scoring; originals are used for rescoring
+                quantization_config=models.ScalarQuantization(
+                    scalar=models.ScalarQuantizationConfig(
+                        type=models.ScalarType.INT8,
+                        quantile=0.99,
+                        always_ram=True
+                    )
                 )
             )
-            print(f"Created collection: {self.collection_name}")
+            print(f"Created collection: {collection_name}")
+
+        # Indexed payload fields let filtered searches use the index instead of scanning;
+        # creating an index that already exists is a no-op
+        for field_name, field_schema in payload_indexes.items():
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+            except Exception as e:
+                print(f"Error creating payload index {field_name} on {collection_name}: {str(e)}")
 
-    def store_chunks(self, chunks: List[Dict[str, Any]]):
+    def build_point(self, chunk: Dict[str, Any], vector: List[float]) -> models.PointStruct:
+        """
+        Build the Qdrant point for a chunk and its embedding
+        """
+        return models.PointStruct(
+            id=chunk['chunk_id'],
+            vector=vector,
+            payload={
+                'content': chunk['content'],
+                'document_id': chunk.get('document_id', ''),
+                'title': chunk.get('title', ''),
+                'chapter': chunk.get('chapter', ''),
+                'section': chunk.get('section', ''),
+                'source_path': chunk.get('source_path', ''),
+                # Flat scalars instead of a nested dict: cheaper to decode and indexable
+                'chunk_index': chunk.get('chunk_index', 0),
+                'total_chunks': chunk.get('total_chunks', 1),
+                'method': chunk.get('method', '')
+            }
+        )
+
+    def upsert_points(self, points: List[models.PointStruct], batch_size: int = 256, wait: bool = True):
+        """
+        Upload points to Qdrant in batches to keep request sizes bounded
+        Batches are acknowledged before Qdrant applies them; with wait=True the last
+        batch waits, and since updates are applied in order so have all earlier ones
+        """
+        batch_starts = range(0, len(points), batch_size)
+        for start in batch_starts:
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=points[start:start + batch_size],
+                wait=wait and start == batch_starts[-1]
+            )
+
+    def store_chunks(self, chunks: List[Dict[str, Any]], flush: bool = False):
         """
         Store document chunks with their embeddings in Qdrant
         Each chunk should have: chunk_id, content, document_id, title, chapter, section, source_path
+        Chunks are embedded and uploaded one embedding batch at a time, so only one batch
+        of vectors is held in memory and the upload of a batch overlaps embedding the next
+        Uploads return before Qdrant has applied them; with flush=True the last upload waits
+        until all of them are applied, so the chunks are searchable when this returns
         """
-        points = []
-        texts = []
-
-        for chunk in chunks:
-            texts.append(chunk['content'])
-
-        # Generate embeddings for all texts at once
-        embeddings = embedding_service.generate_embeddings(texts)
-
-        for i, chunk in enumerate(chunks):
-            point = models.PointStruct(
-                id=chunk['chunk_id'],
-                vector=embeddings[i],
-                payload={
-                    'content': chunk['content'],
-                    'document_id': chunk.get('document_id', ''),
-                    'title': chunk.get('title', ''),
-                    'chapter': chunk.get('chapter', ''),
-                    'section': chunk.get('section', ''),
-                    'source_path': chunk.get('source_path', ''),
-                    'metadata': chunk.get('metadata', {})
-                }
-            )
-            points.append(point)
+        batch_starts = range(0, len(chunks), COHERE_MAX_BATCH)
+        with ThreadPoolExecutor(max_workers=1) as uploader:
+            pending_upload = None
+            for start in batch_starts:
+                batch = chunks[start:start + COHERE_MAX_BATCH]
+                embeddings = embedding_service.generate_embeddings([chunk['content'] for chunk in batch],
+                                                                 use_cache=False)
+                points = [self.build_point(chunk, vector) for chunk, vector in zip(batch, embeddings)]
+
+                # Surface a failed upload before queueing the next one
+                if pending_upload is not None:
+                    pending_upload.result()
+                pending_upload = uploader.submit(self.upsert_points, points,
+                                                 wait=flush and start == batch_starts[-1])
+
+            if pending_upload is not None:
+                pending_upload.result()
 
-        # Upload points to Qdrant
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=points
-        )
         print(f"Stored {len(chunks)} chunks in Qdrant collection: {self.collection_name}")
 
-    def search_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _search_filter(self, document_id: Optional[str]) -> Optional[models.Filter]:
         """
-        Search for relevant chunks based on the query
-        If selected_text is provided, search only within that text context
-        """
-        # Generate embedding for the query
-        query_embedding = embedding_service.embed_single_text(query)
-
-        # If selected_text is provided, we'll search with a filter for that specific content
-        search_filter = None
-        if selected_text:
-            # In this case, we'll do a keyword search in the payload to match selected text
-            # This is a simplified approach - in practice, you might want to match based on document_id
-            # or other metadata that indicates the selected text context
-            search_filter = models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="content",
-                        match=models.MatchText(text=selected_text[:100])  # Use first 100 chars as approximation
-                    )
-                ]
-            )
+        Build the payload filter restricting a search to one document, if any
+        """
+        if not document_id:
+            return None
 
-        # Perform the search
-        search_results = self.client.search(
+        return models.Filter(
+            must=[
+                models.FieldCondition(
+                    key="document_id",
+                    match=models.MatchValue(value=document_id)
+                )
+            ]
+        )
+
+    def _embed_query_and_selection(self, query: str, selected_text: str,
+                                   query_embedding: Optional[List[float]]) -> Tuple[List[float], List[float]]:
+        """
+        Embed the query and the selected text in a single embedding call
+        """
+        if query_embedding is not None:
+            return query_embedding, embedding_service.generate_embeddings([selected_text])[0]
+        query_embedding, selection_embedding = embedding_service.generate_embeddings([query, selected_text])
+        return query_embedding, selection_embedding
+
+    def _resolve_document_id(self, selection_embedding: List[float]) -> Optional[str]:
+        """
+        Find the document the selected text was taken from: the document of its nearest chunk
+        """
+        hits = self.client.query_points(
             collection_name=self.collection_name,
-            query_vector=query_embedding,
-            limit=top_k,
-            query_filter=search_filter,
-            with_payload=True
+            query=selection_embedding,
+            limit=1,
+            with_payload=["document_id"]
+        ).points
+        return hits[0].payload.get('document_id') if hits else None
+
+    async def _aresolve_document_id(self, selection_embedding: List[float]) -> Optional[str]:
+        hits = (await self.aclient.query_points(
+            collection_name=self.collection_name,
+            query=selection_embedding,
+            limit=1,
+            with_payload=["document_id"]
+        )).points
+        return hits[0].payload.get('document_id') if hits else None
+
+    def _search_params(self, hnsw_ef: Optional[int], top_k: int) -> models.SearchParams:
+        # Without an explicit ef, scale it with top_k so large result sets keep their recall
+        return models.SearchParams(
+            hnsw_ef=hnsw_ef or max(app_config.qdrant_ef_search, top_k * 8),
+            exact=False,
+            quantization=models.QuantizationSearchParams(
+                ignore=False,
+                rescore=True,
+                oversampling=2.0
+            )
         )
 
-        # Format results
+    def _format_results(self, search_results) -> List[Dict[str, Any]]:
         results = []
         for result in search_results:
             results.append({
@@ -127,9 +246,119 @@ class QdrantVectorService:
                 'section': result.payload.get('section', ''),
                 'similarity_score': result.score
             })
-
         return results
 
+    def _search_cache_key(self, query: str, top_k: int, selected_text: Optional[str],
+                          hnsw_ef: Optional[int], document_id: Optional[str]) -> str:
+        return get_cache_key(
+            "search", query, top_k,
+            selected_text=selected_text,
+            hnsw_ef=hnsw_ef,
+            document_id=document_id
+        )
+
+    def search_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None,
+                      query_embedding: Optional[List[float]] = None,
+                      hnsw_ef: Optional[int] = None,
+                      document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Search for relevant chunks based on the query
+        If selected_text is provided, search only within the document it was taken from;
+        pass its document_id when known, otherwise it is looked up from the selected text
+        If query_embedding is provided, it is used instead of embedding the query again
+        hnsw_ef trades recall for latency; by default it is top_k * 8, but at least QDRANT_EF_SEARCH
+        Results are cached per query and search options; query embeddings are cached by the embedding service
+        """
+        cache_key = self._search_cache_key(query, top_k, selected_text, hnsw_ef, document_id)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        # If selected_text is provided, restrict the search to the document it was taken from
+        if selected_text and not document_id:
+            query_embedding, selection_embedding = self._embed_query_and_selection(query, selected_text, query_embedding)
+            document_id = self._resolve_document_id(selection_embedding)
+        if query_embedding is None:
+            # Generate embedding for the query
+            query_embedding = embedding_service.embed_single_text(query)
+
+        # Perform the search
+        search_results = self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_embedding,
+            limit=top_k,
+            query_filter=self._search_filter(document_id),
+            search_params=self._search_params(hnsw_ef, top_k),
+            with_payload=SEARCH_PAYLOAD_FIELDS
+        ).points
+
+        results = self._format_results(search_results)
+        search_cache.put(cache_key, results)
+        return list(results)
+
+    async def asearch_chunks(self, query: str, top_k: int = 5, selected_text: Optional[str] = None,
+                             query_embedding: Optional[List[float]] = None,
+                             hnsw_ef: Optional[int] = None,
+                             document_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Async variant of search_chunks using the async Qdrant client
+        """
+        cache_key = self._search_cache_key(query, top_k, selected_text, hnsw_ef, document_id)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        if selected_text and not document_id:
+            # Concurrent embeds are coalesced by the micro-batcher into one embedding call
+            if query_embedding is None:
+                query_embedding, selection_embedding = await asyncio.gather(
+                    embedding_service.aembed(query),
+                    embedding_service.aembed(selected_text)
+                )
+            else:
+                selection_embedding = await embedding_service.aembed(selected_text)
+            document_id = await self._aresolve_document_id(selection_embedding)
+        if query_embedding is None:
+            query_embedding = await embedding_service.aembed(query)
+
+        search_results = (await self.aclient.query_points(
+            collection_name=self.collection_name,
+            query=query_embedding,
+            limit=top_k,
+            query_filter=self._search_filter(document_id),
+            search_params=self._search_params(hnsw_ef, top_k),
+            with_payload=SEARCH_PAYLOAD_FIELDS
+        )).points
+
+        results = self._format_results(search_results)
+        search_cache.put(cache_key, results)
+        return list(results)
+
+    def search_chunks_batch(self, queries: List[str], top_k: int = 5,
+                            hnsw_ef: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries at once: one embedding call for all queries and
+        one Qdrant batch search request. Returns one result list per query
+        """
+        if not queries:
+            return []
+
+        query_embeddings = embedding_service.generate_embeddings(queries)
+        batch_results = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(
+                    query=query_embedding,
+                    limit=top_k,
+                    params=self._search_params(hnsw_ef, top_k),
+                    with_payload=SEARCH_PAYLOAD_FIELDS
+                )
+                for query_embedding in query_embeddings
+            ]
+        )
+
+        return [self._format_results(response.points) for response in batch_results]
+
     def get_chunk_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
         """
         Retrieve a specific chunk by its ID
@@ -151,7 +380,9 @@ class QdrantVectorService:
                 'source_path': payload.get('source_path', ''),
                 'chapter': payload.get('chapter', ''),
                 'section': payload.get('section', ''),
-                'metadata': payload.get('metadata', {})
+                'chunk_index': payload.get('chunk_index', 0),
+                'total_chunks': payload.get('total_chunks', 1),
+                'method': payload.get('method', '')
             }
 
         return None
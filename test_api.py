@@ -2,7 +2,7 @@ import asyncio
 import aiohttp
 import time
 from typing import Dict, Any, List
-import json
+import orjson
 
 class ChatbotAPITester:
     def __init__(self, base_url: str = "http://localhost:8000"):
@@ -10,7 +10,9 @@ class ChatbotAPITester:
         self.session = None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        # Reuse keep-alive connections across requests instead of a handshake per request
+        connector = aiohttp.TCPConnector(limit=100, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -23,7 +25,7 @@ class ChatbotAPITester:
             async with self.session.get(f"{self.base_url}/api/health") as response:
                 return {
                     "status": response.status,
-                    "body": await response.json(),
+                    "body": orjson.loads(await response.read()),
                     "success": response.status == 200
                 }
         except Exception as e:
@@ -46,7 +48,7 @@ class ChatbotAPITester:
                 response_time = time.time() - start_time
                 return {
                     "status": response.status,
-                    "body": await response.json(),
+                    "body": orjson.loads(await response.read()),
                     "response_time": response_time,
                     "success": response.status == 200
                 }
@@ -64,7 +66,7 @@ class ChatbotAPITester:
             async with self.session.post(f"{self.base_url}/api/search", json=payload) as response:
                 return {
                     "status": response.status,
-                    "body": await response.json(),
+                    "body": orjson.loads(await response.read()),
                     "success": response.status == 200
                 }
         except Exception as e:
@@ -104,13 +106,10 @@ class ChatbotAPITester:
     async def test_performance(self) -> Dict[str, Any]:
         """Test performance metrics"""
         try:
-            # Test response time for multiple requests
-            response_times = []
-            for i in range(3):
-                start_time = time.time()
-                await self.test_chat_endpoint(f"Test message {i}")
-                response_time = time.time() - start_time
-                response_times.append(response_time)
+            # Test response time for multiple concurrent requests
+            chat_tasks = [self.test_chat_endpoint(f"Test message {i}") for i in range(3)]
+            results = await asyncio.gather(*chat_tasks)
+            response_times = [result["response_time"] for result in results if "response_time" in result]
 
             avg_response_time = sum(response_times) / len(response_times) if response_times else 0
 
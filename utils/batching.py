@@ -0,0 +1,58 @@
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item requests into one call of a batch function.
+    Requests are collected until max_batch items are pending or max_wait seconds
+    have passed since the first one, then the batch function runs in the threadpool
+    and each caller receives its own result.
+    """
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: int = 32, max_wait: float = 0.005):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Keep references to running batches so they are not garbage collected mid-flight
+        self._running = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item for the next batch and wait for its result
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await run_in_threadpool(self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -1,61 +1,69 @@
+import hashlib
+import json
+import threading
 import time
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Tuple
 from collections import OrderedDict
 from config.app_config import app_config
 
 class LRUCache:
     """
     Simple LRU Cache implementation for storing embeddings and other frequently accessed data
+    Safe to share between the event loop and worker threads
     """
     def __init__(self, max_size: int = 1000, ttl: int = 3600):
         self.max_size = max_size
         self.ttl = ttl  # Time to live in seconds
-        self.cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        # Entries are (value, expires_at) tuples on the monotonic clock
+        self.cache: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        # get() reorders the dict too, so every access holds the lock
+        self._lock = threading.Lock()
 
     def get(self, key: str) -> Optional[Any]:
         """
         Get value from cache if it exists and hasn't expired
         """
-        if key in self.cache:
-            item = self.cache[key]
-            # Check if item has expired
-            if time.time() - item['timestamp'] < self.ttl:
+        with self._lock:
+            item = self.cache.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at > time.monotonic():
                 # Move to end (most recently used)
                 self.cache.move_to_end(key)
-                return item['value']
-            else:
-                # Remove expired item
-                del self.cache[key]
+                return value
 
-        return None
+            # Remove expired item
+            del self.cache[key]
+            return None
 
     def put(self, key: str, value: Any):
         """
         Add value to cache
         """
-        # Remove oldest item if cache is full
-        if len(self.cache) >= self.max_size:
-            self.cache.popitem(last=False)
+        with self._lock:
+            # Remove oldest item if cache is full
+            if key not in self.cache and len(self.cache) >= self.max_size:
+                self.cache.popitem(last=False)
 
-        self.cache[key] = {
-            'value': value,
-            'timestamp': time.time()
-        }
-        # Move to end (most recently used)
-        self.cache.move_to_end(key)
+            self.cache[key] = (value, time.monotonic() + self.ttl)
+            # Move to end (most recently used)
+            self.cache.move_to_end(key)
 
     def delete(self, key: str):
         """
         Remove item from cache
         """
-        if key in self.cache:
-            del self.cache[key]
+        with self._lock:
+            self.cache.pop(key, None)
 
     def clear(self):
         """
         Clear all items from cache
         """
-        self.cache.clear()
+        with self._lock:
+            self.cache.clear()
 
     def size(self) -> int:
         """
@@ -65,9 +73,10 @@ class LRUCache:
 
 # Global cache instance
 if app_config.cache_enabled:
-    embedding_cache = LRUCache(max_size=500, ttl=app_config.cache_ttl)  # Cache for embeddings
+    embedding_cache = LRUCache(max_size=1000, ttl=app_config.cache_ttl)   # Cache for embeddings
     response_cache = LRUCache(max_size=200, ttl=app_config.cache_ttl)   # Cache for responses
     search_cache = LRUCache(max_size=300, ttl=app_config.cache_ttl)     # Cache for search results
+    llm_cache = LRUCache(max_size=2048, ttl=900)                         # Cache for LLM completions
 else:
     # Create no-op cache if caching is disabled
     class NoOpCache:
@@ -80,15 +89,26 @@ else:
     embedding_cache = NoOpCache()
     response_cache = NoOpCache()
     search_cache = NoOpCache()
+    llm_cache = NoOpCache()
+
+# Argument types whose repr() is a stable, unambiguous serialization
+_SIMPLE_KEY_TYPES = (str, bytes, int, float, bool, type(None))
 
 def get_cache_key(*args, **kwargs) -> str:
     """
     Generate a cache key from function arguments
     """
-    import hashlib
-    import json
+    items = sorted(kwargs.items())
+
+    if all(isinstance(a, _SIMPLE_KEY_TYPES) for a in args) and \
+            all(isinstance(v, _SIMPLE_KEY_TYPES) for _, v in items):
+        # Common case of plain strings and numbers: skip JSON and hash the joined reprs
+        parts = [repr(a) for a in args]
+        parts.extend(f"{k}={v!r}" for k, v in items)
+        cache_input = "\x1f".join(parts)
+    else:
+        # Create a string representation of all arguments
+        cache_input = json.dumps((args, items), sort_keys=True)
 
-    # Create a string representation of all arguments
-    cache_input = json.dumps((args, sorted(kwargs.items())), sort_keys=True)
     # Generate hash to create a consistent key
-    return hashlib.md5(cache_input.encode()).hexdigest()
\ No newline at end of file
+    return hashlib.blake2b(cache_input.encode(), digest_size=16).hexdigest()
@@ -1,17 +1,21 @@
 import tiktoken
+import hashlib
 import re
 from typing import List, Dict, Any
-from uuid import uuid5, NAMESPACE_URL
+from uuid import UUID
 
 # Initialize tokenizer for chunking
 tokenizer = tiktoken.get_encoding("cl100k_base")
 
+_WHITESPACE_RE = re.compile(r'\s+')
+_SENTENCE_END_RE = re.compile(r'[.!?]+\s+')
+
 def clean_text(text: str) -> str:
     """
     Clean text by removing extra whitespace and normalizing
     """
     # Remove extra whitespace and newlines
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     return text.strip()
 
 def chunk_text_by_tokens(text: str, max_tokens: int = 500, overlap_tokens: int = 50) -> List[str]:
@@ -24,31 +28,18 @@ def chunk_text_by_tokens(text: str, max_tokens: int = 500, overlap_tokens: int =
     # Tokenize the text
     tokens = tokenizer.encode(text)
 
-    chunks = []
-    start_idx = 0
-
-    while start_idx < len(tokens):
-        # Determine the end index for this chunk
-        end_idx = start_idx + max_tokens
-
-        # If this is not the last chunk, add overlap
-        if end_idx < len(tokens):
-            end_idx += overlap_tokens
-
-        # Extract the token chunk
-        token_chunk = tokens[start_idx:end_idx]
+    # Each chunk starts max_tokens after the previous one and carries overlap_tokens of the next;
+    # slicing past the end simply yields a shorter last chunk
+    token_chunks = [
+        tokens[start_idx:start_idx + max_tokens + overlap_tokens]
+        for start_idx in range(0, len(tokens), max_tokens)
+    ]
 
-        # Decode back to text
-        chunk_text = tokenizer.decode(token_chunk)
-        chunk_text = clean_text(chunk_text)
+    # Decode all chunks in one call instead of one decode per chunk
+    chunks = [clean_text(chunk_text) for chunk_text in tokenizer.decode_batch(token_chunks)]
 
-        if chunk_text:  # Only add non-empty chunks
-            chunks.append(chunk_text)
-
-        # Move start index forward by max_tokens (not including overlap for next iteration)
-        start_idx += max_tokens
-
-    return chunks
+    # Only keep non-empty chunks
+    return [chunk_text for chunk_text in chunks if chunk_text]
 
 def chunk_text_by_sentences(text: str, max_tokens: int = 500) -> List[str]:
     """
@@ -58,55 +49,48 @@ def chunk_text_by_sentences(text: str, max_tokens: int = 500) -> List[str]:
         return []
 
     # Split by sentences
-    sentences = re.split(r'[.!?]+\s+', text)
+    sentences = _SENTENCE_END_RE.split(text)
+    # Tokenize every sentence once and keep a running count instead of re-encoding the growing chunk
+    sentence_tokens = tokenizer.encode_batch(sentences)
     chunks = []
-    current_chunk = ""
+    current_sentences = []
+    current_tokens = 0
 
-    for sentence in sentences:
+    for sentence, tokens in zip(sentences, sentence_tokens):
         # Check if adding this sentence would exceed the token limit
-        test_chunk = current_chunk + " " + sentence if current_chunk else sentence
-        token_count = len(tokenizer.encode(test_chunk))
-
-        if token_count <= max_tokens:
-            current_chunk = test_chunk
+        if current_tokens + len(tokens) <= max_tokens:
+            current_sentences.append(sentence)
+            current_tokens += len(tokens)
+            continue
+
+        # Save the current chunk and start a new one
+        current_chunk = " ".join(current_sentences)
+        if current_chunk.strip():
+            chunks.append(clean_text(current_chunk))
+
+        # If the sentence itself is too long, chunk it by tokens
+        if len(tokens) > max_tokens:
+            chunks.extend(chunk_text_by_tokens(sentence, max_tokens, 0))
+            current_sentences = []
+            current_tokens = 0
         else:
-            # If current chunk is not empty, save it and start a new one
-            if current_chunk.strip():
-                chunks.append(clean_text(current_chunk))
-            # If the sentence itself is too long, chunk it by tokens
-            if len(tokenizer.encode(sentence)) > max_tokens:
-                sub_chunks = chunk_text_by_tokens(sentence, max_tokens, 0)
-                chunks.extend(sub_chunks)
-            else:
-                current_chunk = sentence
+            current_sentences = [sentence]
+            current_tokens = len(tokens)
 
     # Add the last chunk if it exists
+    current_chunk = " ".join(current_sentences)
     if current_chunk.strip():
         chunks.append(clean_text(current_chunk))
 
     return chunks
 
-def create_chunk_dict(content: str, source_path: str, document_id: str,
-                     title: str = "", chapter: str = "", section: str = "",
-                     metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+def make_chunk_id(source_path: str, content: str) -> str:
     """
-    Create a properly formatted chunk dictionary with all required fields
+    Deterministic chunk id from the source path and content, so re-ingesting a document
+    overwrites its points instead of adding duplicates. Formatted as a UUID for Qdrant
     """
-    if metadata is None:
-        metadata = {}
-
-    chunk_id = str(uuid5(NAMESPACE_URL, f"{source_path}_{len(content)}_{hash(content)}"))
-
-    return {
-        'chunk_id': chunk_id,
-        'content': content,
-        'document_id': document_id,
-        'title': title,
-        'chapter': chapter,
-        'section': section,
-        'source_path': source_path,
-        'metadata': metadata
-    }
+    digest = hashlib.blake2b(f"{source_path}\x1f{content}".encode(), digest_size=16).digest()
+    return str(UUID(bytes=digest))
 
 def chunk_document(content: str, source_path: str, document_id: str,
                   title: str = "", chapter: str = "", section: str = "",
@@ -120,22 +104,21 @@ def chunk_document(content: str, source_path: str, document_id: str,
     else:  # default to tokens
         chunks = chunk_text_by_tokens(content, max_tokens, overlap_tokens)
 
-    # Convert each chunk string to a proper chunk dictionary
-    chunk_dicts = []
-    for i, chunk_content in enumerate(chunks):
-        chunk_dict = create_chunk_dict(
-            content=chunk_content,
-            source_path=source_path,
-            document_id=document_id,
-            title=title,
-            chapter=chapter,
-            section=section,
-            metadata={
-                'chunk_index': i,
-                'total_chunks': len(chunks),
-                'method': chunk_method
-            }
-        )
-        chunk_dicts.append(chunk_dict)
-
-    return chunk_dicts
\ No newline at end of file
+    # Convert each chunk string to a proper chunk dictionary; the fields shared by
+    # every chunk of the document are looked up once instead of once per chunk
+    total_chunks = len(chunks)
+    return [
+        {
+            'chunk_id': make_chunk_id(source_path, chunk_content),
+            'content': chunk_content,
+            'document_id': document_id,
+            'title': title,
+            'chapter': chapter,
+            'section': section,
+            'source_path': source_path,
+            'chunk_index': i,
+            'total_chunks': total_chunks,
+            'method': chunk_method
+        }
+        for i, chunk_content in enumerate(chunks)
+    ]
@@ -1,7 +1,8 @@
 from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from typing import Dict, Any
 import logging
+from datetime import datetime
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +24,7 @@ class ServiceErrorHandler:
             "error": f"{service_name}_unavailable",
             "message": f"The {service_name} service is currently unavailable. Please try again later.",
             "fallback_message": "This information is not available in the book.",
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
 
     @staticmethod
@@ -36,7 +37,7 @@ class ServiceErrorHandler:
         return {
             "error": "database_unavailable",
             "message": "The database service is currently unavailable. Chat history may not be saved.",
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
 
     @staticmethod
@@ -50,7 +51,7 @@ class ServiceErrorHandler:
             "error": "internal_error",
             "message": "An internal error occurred. Please try again later.",
             "fallback_message": "This information is not available in the book.",
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
 
 # Global instance
@@ -59,23 +60,23 @@ error_handler = ServiceErrorHandler()
 # FastAPI exception handlers
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.warning(f"HTTP error {exc.status_code}: {exc.detail}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": "http_error",
             "message": exc.detail,
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
     )
 
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "internal_error",
             "message": "An internal server error occurred",
             "fallback_message": "This information is not available in the book.",
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat()
         }
     )
\ No newline at end of file
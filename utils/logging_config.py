@@ -1,7 +1,7 @@
 import logging
 import sys
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class CustomFormatter(logging.Formatter):
     """Custom formatter to add color and structure to logs"""
@@ -11,22 +11,33 @@ class CustomFormatter(logging.Formatter):
     red = "\x1b[31;20m"
     bold_red = "\x1b[31;1m"
     reset = "\x1b[0m"
-    format = (
+    log_format = (
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s (%(filename)s:%(lineno)d)"
     )
 
     FORMATS = {
-        logging.DEBUG: grey + format + reset,
-        logging.INFO: grey + format + reset,
-        logging.WARNING: yellow + format + reset,
-        logging.ERROR: red + format + reset,
-        logging.CRITICAL: bold_red + format + reset
+        logging.DEBUG: grey + log_format + reset,
+        logging.INFO: grey + log_format + reset,
+        logging.WARNING: yellow + log_format + reset,
+        logging.ERROR: red + log_format + reset,
+        logging.CRITICAL: bold_red + log_format + reset
     }
 
+    def __init__(self, use_color: Optional[bool] = None):
+        super().__init__()
+        # Colors only help on a terminal; redirected logs get the plain format
+        if use_color is None:
+            use_color = sys.stdout.isatty()
+
+        # Build one formatter per level up front instead of one per record
+        self._formatters = {
+            level: logging.Formatter(fmt if use_color else self.log_format)
+            for level, fmt in self.FORMATS.items()
+        }
+        self._default_formatter = logging.Formatter()
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self._formatters.get(record.levelno, self._default_formatter).format(record)
 
 def setup_logging(level: str = "INFO") -> logging.Logger:
     """Set up logging configuration"""
@@ -1,6 +1,11 @@
 from typing import List, Dict, Any
+import json
 from services.retrieval_service import retrieval_service
 
+# Phrase the LLM uses when the answer is not in the retrieved content
+_NOT_AVAILABLE = "not available in the book"
+_NOT_AVAILABLE_LEN = len(_NOT_AVAILABLE)
+
 def format_sources(cited_chunks: List[Dict[str, Any]]) -> str:
     """
     Format the sources for inclusion in the response
@@ -11,10 +16,12 @@ def format_sources(cited_chunks: List[Dict[str, Any]]) -> str:
     sources_text = "\n\nSources:\n"
     for i, chunk in enumerate(cited_chunks, 1):
         source_info = f"{i}. {chunk.get('title', 'Untitled')} - {chunk.get('source_path', 'Unknown path')}"
-        if chunk.get('chapter'):
-            source_info += f" (Chapter: {chunk.get('chapter')})"
-        if chunk.get('section'):
-            source_info += f" (Section: {chunk.get('section')})"
+        chapter = chunk.get('chapter')
+        if chapter:
+            source_info += f" (Chapter: {chapter})"
+        section = chunk.get('section')
+        if section:
+            source_info += f" (Section: {section})"
         sources_text += f"{source_info}\n"
 
     return sources_text
@@ -23,15 +30,8 @@ def enhance_response_with_sources(response: str, cited_chunks: List[Dict[str, An
     """
     Enhance the response by adding source citations
     """
-    if not cited_chunks:
-        # If no sources but response indicates info not available, don't add sources
-        if "not available in the book" in response.lower():
-            return response
-        # Otherwise, return response as is
-        return response
-
-    # Don't add sources if the response indicates the info isn't available
-    if "not available in the book" in response.lower():
+    # Without sources, or when the response indicates the info isn't available, don't add sources
+    if not cited_chunks or _NOT_AVAILABLE in response.lower():
         return response
 
     # Add source citations to the response
@@ -44,8 +44,14 @@ def validate_sources_in_response(response: str, cited_chunks: List[Dict[str, Any
     """
     # Basic validation: if we have sources but the response says info is not available,
     # that's acceptable
-    if "not available in the book" in response.lower():
+    if _NOT_AVAILABLE in response.lower():
         return True
 
     # If we have sources, the response should be substantive
-    return len(response.strip()) > len("not available in the book")
\ No newline at end of file
+    return len(response.strip()) > _NOT_AVAILABLE_LEN
+
+def format_sse_event(data: Dict[str, Any]) -> str:
+    """
+    Format a payload as a server-sent event
+    """
+    return f"data: {json.dumps(data)}\n\n"
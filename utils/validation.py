@@ -1,69 +1,28 @@
 import re
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, validator, ValidationError
-from config.app_config import app_config
-
-class ChatRequestValidator(BaseModel):
-    message: str
-    session_id: Optional[str] = None
-    selected_text: Optional[str] = None
-    history: Optional[list] = []
-
-    @validator('message')
-    def validate_message(cls, v):
-        if not v or len(v.strip()) == 0:
-            raise ValueError('Message cannot be empty')
-        if len(v) > 10000:  # Limit message length
-            raise ValueError('Message too long (max 10000 characters)')
-        # Basic sanitization - remove potentially harmful content
-        sanitized = sanitize_input(v)
-        return sanitized
-
-    @validator('session_id')
-    def validate_session_id(cls, v):
-        if v is not None:
-            # Basic UUID format validation (not perfect, but catches obvious issues)
-            if not re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', v, re.IGNORECASE):
-                raise ValueError('Invalid session ID format')
-        return v
-
-    @validator('selected_text')
-    def validate_selected_text(cls, v):
-        if v is not None and len(v) > 50000:  # Limit selected text length
-            raise ValueError('Selected text too long (max 50000 characters)')
-        if v:
-            sanitized = sanitize_input(v)
-            return sanitized
-        return v
-
-class SearchRequestValidator(BaseModel):
-    query: str
-    top_k: Optional[int] = 5
-    selected_text: Optional[str] = None
-
-    @validator('query')
-    def validate_query(cls, v):
-        if not v or len(v.strip()) == 0:
-            raise ValueError('Query cannot be empty')
-        if len(v) > 1000:  # Limit query length
-            raise ValueError('Query too long (max 1000 characters)')
-        sanitized = sanitize_input(v)
-        return sanitized
-
-    @validator('top_k')
-    def validate_top_k(cls, v):
-        if v is not None and (v < 1 or v > 20):
-            raise ValueError('top_k must be between 1 and 20')
-        return v
-
-    @validator('selected_text')
-    def validate_selected_text(cls, v):
-        if v is not None and len(v) > 50000:  # Limit selected text length
-            raise ValueError('Selected text too long (max 50000 characters)')
-        if v:
-            sanitized = sanitize_input(v)
-            return sanitized
-        return v
+from typing import Optional, Dict, Any, Literal, Annotated, List, FrozenSet, Tuple
+from pydantic import AfterValidator, BaseModel, Field, StringConstraints, field_validator
+
+# Null bytes and control characters stripped from user input (common whitespace is kept)
+_CTRL_TRANSLATE = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F])
+_CTRL_SEARCH = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+# Meaningful words: whitespace-separated tokens longer than 3 characters
+_WORD_RE = re.compile(r'\S{4,}')
+
+# Lone surrogates are the only str content that cannot be encoded as UTF-8
+_SURROGATE_RE = re.compile('[\ud800-\udfff]')
+
+# Words in a response that may indicate leaked sensitive information
+_SENSITIVE_RE = re.compile(r'password|secret|api_key|token|credential', re.IGNORECASE)
+
+# Phrases showing the LLM declined to answer beyond the selected text; matched against lowercased text
+_EXTERNAL_INDICATORS_RE = re.compile('|'.join(re.escape(indicator) for indicator in (
+    "i don't know",
+    "not in the provided text",
+    "not found in the selected text",
+    "not mentioned in the text",
+    "not specified in the text"
+)))
 
 def sanitize_input(text: str) -> str:
     """
@@ -72,17 +31,56 @@ def sanitize_input(text: str) -> str:
     if not text:
         return text
 
-    # Remove null bytes
-    text = text.replace('\x00', '')
+    # Most input has no control characters; skip building a new string for it
+    if not _CTRL_SEARCH.search(text):
+        return text.strip()
 
-    # Remove control characters (except common whitespace)
-    text = re.sub(r'[\x01-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+    # Remove null bytes and control characters (except common whitespace) in a single pass
+    text = text.translate(_CTRL_TRANSLATE)
 
     # You could add more sanitization rules here based on your specific needs
     # For example, removing script tags if accepting HTML, etc.
 
     return text.strip()
 
+# Length limits are enforced by pydantic-core before the Python validators run
+MessageStr = Annotated[str, StringConstraints(min_length=1, max_length=10000)]
+QueryStr = Annotated[str, StringConstraints(min_length=1, max_length=1000)]
+# Selected text only needs sanitizing, so it is done by the type itself rather than per-model validators
+SelectedTextStr = Annotated[str, StringConstraints(max_length=50000), AfterValidator(sanitize_input)]
+# Matched by pydantic-core's compiled regex; case-insensitive like is_valid_uuid
+SessionIdStr = Annotated[str, StringConstraints(
+    pattern=r'(?i)^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+)]
+
+class ChatRequestValidator(BaseModel):
+    message: MessageStr
+    session_id: Optional[SessionIdStr] = None
+    selected_text: Optional[SelectedTextStr] = None
+    history: Optional[list] = []
+
+    @field_validator('message')
+    @classmethod
+    def validate_message(cls, v):
+        if not v.strip():
+            raise ValueError('Message cannot be empty')
+        # Basic sanitization - remove potentially harmful content
+        return sanitize_input(v)
+
+class SearchRequestValidator(BaseModel):
+    query: QueryStr
+    top_k: Optional[Annotated[int, Field(ge=1, le=20)]] = 5
+    selected_text: Optional[SelectedTextStr] = None
+    document_id: Optional[str] = None  # Document the selected text was taken from, if known
+    accuracy: Optional[Literal["fast", "balanced", "accurate"]] = None
+
+    @field_validator('query')
+    @classmethod
+    def validate_query(cls, v):
+        if not v.strip():
+            raise ValueError('Query cannot be empty')
+        return sanitize_input(v)
+
 def validate_document_content(content: str) -> Dict[str, Any]:
     """
     Validate document content before processing
@@ -94,10 +92,9 @@ def validate_document_content(content: str) -> Dict[str, Any]:
     elif len(content) > 1000000:  # 1MB limit
         errors.append("Content too large (max 1MB)")
 
-    # Check for potential encoding issues
-    try:
-        content.encode('utf-8')
-    except UnicodeError:
+    # Check for potential encoding issues; ASCII content is always valid, and otherwise
+    # searching for surrogates avoids encoding a copy of the whole document
+    if content and not content.isascii() and _SURROGATE_RE.search(content):
         errors.append("Content contains invalid Unicode characters")
 
     return {
@@ -110,12 +107,17 @@ def is_valid_uuid(uuid_string: str) -> bool:
     """
     Validate UUID format
     """
-    import re
-    uuid_regex = re.compile(
-        r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$',
-        re.IGNORECASE
-    )
-    return bool(uuid_regex.match(uuid_string))
+    # Fixed 8-4-4-4-12 layout: check the hyphen positions, then that the rest is hex
+    if not isinstance(uuid_string, str) or len(uuid_string) != 36:
+        return False
+    if uuid_string[8] != '-' or uuid_string[13] != '-' or uuid_string[18] != '-' or uuid_string[23] != '-':
+        return False
+    # bytes.fromhex checks every hex pair in one C loop; it skips whitespace, and any stray
+    # hyphen shortens the string, so a full UUID is exactly the one that decodes to 16 bytes
+    try:
+        return len(bytes.fromhex(uuid_string.replace('-', ''))) == 16
+    except ValueError:
+        return False
 
 def validate_api_response(response: str) -> Dict[str, Any]:
     """
@@ -130,8 +132,7 @@ def validate_api_response(response: str) -> Dict[str, Any]:
 
     # Check for potential information disclosure
     if response:
-        if any(keyword in response.lower() for keyword in
-               ['password', 'secret', 'api_key', 'token', 'credential']):
+        if _SENSITIVE_RE.search(response):
             errors.append("Response may contain sensitive information")
 
     return {
@@ -140,10 +141,38 @@ def validate_api_response(response: str) -> Dict[str, Any]:
     }
 
 
-def validate_selected_text_response(response: str, selected_text: str) -> Dict[str, Any]:
+def _score_sentences(sentences: List[str], selected_words: FrozenSet[str],
+                     stop_when_decided: bool = False) -> Tuple[int, int]:
+    """
+    Count sentences whose meaningful words do and do not overlap enough with the selected text.
+    Sentences without meaningful words are not counted either way.
+    With stop_when_decided, scoring stops as soon as it is certain whether more than half
+    of all sentences are invalid, so the counts may cover only part of the sentences
+    """
+    total = len(sentences)
+    valid_count = 0
+    invalid_count = 0
+    for scored, sentence in enumerate(sentences, 1):
+        # Look for at least some overlap in meaningful words
+        sentence_words = {m.group() for m in _WORD_RE.finditer(sentence)}
+        if sentence_words:
+            # Set intersection probes the smaller set against the larger one
+            if len(sentence_words & selected_words) / len(sentence_words) < 0.3:  # Less than 30% overlap
+                invalid_count += 1
+            else:
+                valid_count += 1
+
+        # Decided once more than half are invalid, or the remaining sentences cannot get there
+        if stop_when_decided and (2 * invalid_count > total or 2 * (invalid_count + total - scored) <= total):
+            break
+    return valid_count, invalid_count
+
+def validate_selected_text_response(response: str, selected_text: str, fast: bool = False) -> Dict[str, Any]:
     """
     Validate that the response is based only on the selected text.
     This function checks if the response content is grounded in the provided selected text.
+    With fast=True only is_valid and errors are computed; sentence scoring stops once the
+    outcome is known, and no confidence or sentence counts are returned
     """
     errors = []
 
@@ -163,62 +192,47 @@ def validate_selected_text_response(response: str, selected_text: str) -> Dict[s
             "confidence": 0.0
         }
 
-    # Convert both to lowercase for comparison
     response_lower = response.lower()
-    selected_text_lower = selected_text.lower()
+
+    # If the response contains phrases that clearly indicate external knowledge was declined,
+    # it is valid regardless of word overlap, so skip the per-sentence checks
+    if _EXTERNAL_INDICATORS_RE.search(response_lower):
+        # This is actually good - it means the LLM is properly refusing to answer
+        # when information isn't in the selected text
+        return {
+            "is_valid": True,
+            "errors": [],
+            "confidence": 1.0,
+            "validation_note": "Response properly indicates information not available in selected text"
+        }
 
     # Check if response contains information not in selected text
     # This is a simple validation that looks for key phrases
-    response_sentences = [s.strip() for s in re.split(r'[.!?]+', response) if s.strip()]
-
-    invalid_sentences = []
-    valid_sentences = []
+    # Split the already lowercased response; only sentence counts are reported, so original case is not needed
+    response_sentences = [s for s in map(str.strip, _SENTENCE_SPLIT_RE.split(response_lower)) if s]
 
-    for sentence in response_sentences:
-        sentence_lower = sentence.lower().strip()
-        if sentence_lower:
-            # Check if this sentence contains information from the selected text
-            # Look for at least some overlap in meaningful words
-            sentence_words = set([word for word in sentence_lower.split() if len(word) > 3])
-            selected_words = set([word for word in selected_text_lower.split() if len(word) > 3])
-
-            if sentence_words:
-                # Calculate overlap
-                common_words = sentence_words.intersection(selected_words)
-                overlap_ratio = len(common_words) / len(sentence_words) if sentence_words else 0
+    # Meaningful words of the selected text; they do not depend on the sentence
+    selected_text_lower = selected_text.lower()
+    selected_words = frozenset(m.group() for m in _WORD_RE.finditer(selected_text_lower))
 
-                if overlap_ratio < 0.3:  # If less than 30% of meaningful words overlap
-                    invalid_sentences.append(sentence)
-                else:
-                    valid_sentences.append(sentence)
+    valid_count, invalid_count = _score_sentences(response_sentences, selected_words, stop_when_decided=fast)
 
     # If more than 50% of sentences are invalid, fail validation
     total_sentences = len(response_sentences)
-    if total_sentences > 0 and len(invalid_sentences) / total_sentences > 0.5:
-        errors.append(f"Response contains information not found in selected text. {len(invalid_sentences)}/{total_sentences} sentences appear to be outside the selected text context.")
-
-    # Additional check: if the response contains phrases that clearly indicate external knowledge
-    external_indicators = [
-        "i don't know",
-        "not in the provided text",
-        "not found in the selected text",
-        "not mentioned in the text",
-        "not specified in the text"
-    ]
-
-    if any(indicator in response_lower for indicator in external_indicators):
-        # This is actually good - it means the LLM is properly refusing to answer
-        # when information isn't in the selected text
+    if fast:
+        if 2 * invalid_count > total_sentences:
+            errors.append("Response contains information not found in selected text. More than half of the sentences appear to be outside the selected text context.")
         return {
-            "is_valid": True,
-            "errors": [],
-            "confidence": 1.0,
-            "validation_note": "Response properly indicates information not available in selected text"
+            "is_valid": len(errors) == 0,
+            "errors": errors
         }
 
+    if total_sentences > 0 and invalid_count / total_sentences > 0.5:
+        errors.append(f"Response contains information not found in selected text. {invalid_count}/{total_sentences} sentences appear to be outside the selected text context.")
+
     # Calculate confidence based on sentence overlap
     if total_sentences > 0:
-        valid_ratio = len(valid_sentences) / total_sentences
+        valid_ratio = valid_count / total_sentences
         confidence = min(1.0, valid_ratio)  # Cap at 1.0
     else:
         confidence = 0.0
@@ -227,7 +241,7 @@ def validate_selected_text_response(response: str, selected_text: str) -> Dict[s
         "is_valid": len(errors) == 0,
         "errors": errors,
         "confidence": confidence,
-        "valid_sentences_count": len(valid_sentences),
-        "invalid_sentences_count": len(invalid_sentences),
+        "valid_sentences_count": valid_count,
+        "invalid_sentences_count": invalid_count,
         "total_sentences": total_sentences
     }
\ No newline at end of file